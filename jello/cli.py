@@ -3,12 +3,50 @@
 import os
 import sys
 import signal
+import select
+import errno
+import time
+import json
 import shutil
+import io
 import textwrap
+import itertools
+import contextlib
 import traceback
+import multiprocessing
+from collections import deque
 from textwrap import TextWrapper
+
+# resource is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
 import jello
-from jello.lib import opts, load_json, read_file, pyquery, Schema, Json
+from jello.lib import (opts, INPUT_FORMATS, READ_SIZE, load_json, detect_format, iter_json_lines,
+                       iter_json_array, iter_line_chunks, read_chunks, read_file, read_stream,
+                       map_file, pyquery, pyquery_stream, Query, Schema, SchemaSummary, Json, add_hook,
+                       remove_hook)
+
+
+LONG_OPTIONS = {'stream', 'jobs', 'format', 'stream-path', 'schema-summary', 'profile', 'profile-stats',
+                'metrics-file'}
+
+# brackets of the containers rendered by bounded_text() in error messages
+TEXT_BRACKETS = {dict: ('{', '}'), list: ('[', ']'), tuple: ('(', ')')}
+
+# number of characters of a string rendered at a time by bounded_text()
+TEXT_SLICE = 1024
+
+# approximate size of the JSON Lines chunks sent to each worker process with --jobs
+CHUNK_SIZE = 1024 * 1024
+
+# number of records from a JSON array sent to each worker process with --jobs
+BATCH_SIZE = 1000
+
+# seconds between checks for a closed STDOUT (and flushes of the output) while streaming
+STDOUT_CHECK_INTERVAL = 0.1
 
 
 def ctrlc(signum, frame):
@@ -17,9 +55,11 @@ def ctrlc(signum, frame):
 
 
 def get_stdin():
-    """return STDIN data"""
+    """return STDIN data as bytes (or str if STDIN is not a binary stream)"""
     if sys.stdin.isatty():
         return None
+    elif hasattr(sys.stdin, 'buffer'):
+        return read_stream(sys.stdin.buffer)
     else:
         return sys.stdin.read()
 
@@ -48,6 +88,34 @@ def print_help():
                 -v   version info
                 -h   help
 
+                --stream   process JSON Lines or JSON array input one record at a
+                           time with constant memory. Results are printed as
+                           JSON Lines
+                --stream-path=KEY.KEY
+                           stream the elements of the array at this path
+                           (implies --stream)
+                --jobs=N   process JSON Lines input in parallel with N worker
+                           processes (implies --stream, 0 uses all CPU cores)
+                --format=json|jsonl|auto
+                           input format (default: auto detect)
+                --schema-summary
+                           print each path of the schema once, with array
+                           elements merged into [*], and count the types found
+                           at each path (with --stream, the results of all
+                           records are merged)
+                --profile  print the wall time, CPU time and peak memory growth
+                           of each phase of the run to STDERR
+                --profile=lines
+                           also print the time spent on each line of the query
+                --profile-stats=FILE
+                           write the cProfile stats of the query to FILE (only
+                           the functions and lines of the query are kept)
+                --metrics-file=FILE
+                           append the metrics of the run (input and output
+                           sizes, record count, input format, time and peak
+                           memory, and phase timings with --profile) to FILE as
+                           a JSON line
+
         Use '_' as the input data and use python dict and list bracket syntax
         or dot notation to filter the results and/or rebuild the output.
 
@@ -66,7 +134,538 @@ def print_error(message):
     sys.exit(1)
 
 
+def stdout_closed():
+    """Returns True if STDOUT is a pipe or socket whose reading end has been closed"""
+    try:
+        fd = sys.stdout.fileno()
+        poller = select.poll()
+    except (AttributeError, OSError, ValueError):
+        # no file descriptor (e.g. in tests) or no poll() (Windows)
+        return False
+
+    # error conditions are always reported, so no events need to be requested
+    poller.register(fd, 0)
+    return any(event & (select.POLLERR | select.POLLHUP) for _, event in poller.poll(0))
+
+
+class StdoutWatcher:
+    """
+    Flushes STDOUT and checks whether its reader went away (e.g. `jello ... | head`)
+    at most every STDOUT_CHECK_INTERVAL seconds, so streaming stops early even while
+    nothing is being written. Raises BrokenPipeError when STDOUT is closed.
+    """
+
+    def __init__(self):
+        self.next_check = time.monotonic() + STDOUT_CHECK_INTERVAL
+
+    def check(self):
+        now = time.monotonic()
+        if now < self.next_check:
+            return
+
+        self.next_check = now + STDOUT_CHECK_INTERVAL
+        if stdout_closed():
+            raise BrokenPipeError(errno.EPIPE, 'STDOUT was closed')
+        sys.stdout.flush()
+
+
+def exit_broken_pipe():
+    """Exits quietly when the reader of STDOUT went away"""
+    # point STDOUT at devnull so the buffered output flushed at exit does not fail again
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except (AttributeError, OSError, ValueError):
+        pass
+    sys.exit(1)
+
+
+def _usage():
+    """
+    Returns the CPU time of the process in seconds and its peak resident set size in
+    bytes (None if it is unknown), with one system call where possible
+    """
+    if resource is None:
+        return time.process_time(), None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # macOS reports bytes, others report kilobytes
+    rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return usage.ru_utime + usage.ru_stime, rss
+
+
+class _ProfilePhase:
+    """Context manager that times a phase of a Profiler"""
+    __slots__ = ('profiler', 'name', 'previous')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.previous = None
+
+    def __enter__(self):
+        self.previous = self.profiler.switch(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.switch(self.previous)
+
+
+class _NoProfilePhase:
+    """Context manager used in place of _ProfilePhase when profiling is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_PROFILE_PHASE = _NoProfilePhase()
+
+
+class Profiler:
+    """
+    Measures the wall time, CPU time and peak memory growth of each phase of a run for
+    the --profile option. Phases can be nested: time spent in an inner phase is not
+    counted in the outer one, so the phases add up to the total. The phases of
+    jello.lib are timed by registering hook_start() and hook_stop() with add_hook().
+    Does nothing unless it is enabled.
+    """
+
+    def __init__(self, enabled=False):
+        self.reset(enabled)
+
+    def reset(self, enabled=False):
+        self.enabled = enabled
+        self.phases = {}
+        self.current = None
+        self.stack = []
+        self.start_wall = self.wall = time.perf_counter()
+        self.cpu, self.rss = _usage()
+        self.start_cpu = self.cpu
+
+    def switch(self, name):
+        """Stops timing the current phase and starts timing phase name. Returns the phase that was stopped."""
+        if not self.enabled:
+            return None
+
+        wall = time.perf_counter()
+        cpu, rss = _usage()
+
+        previous = self.current
+        if previous is not None:
+            totals = self.phases.setdefault(previous, [0.0, 0.0, 0])
+            totals[0] += wall - self.wall
+            totals[1] += cpu - self.cpu
+            if rss is not None:
+                totals[2] += rss - self.rss
+
+        self.current = name
+        self.wall = wall
+        self.cpu = cpu
+        self.rss = rss
+        return previous
+
+    def hook_start(self, phase):
+        """add_hook() callback that starts timing a phase of jello.lib"""
+        self.stack.append(self.switch(phase))
+
+    def hook_stop(self, phase, seconds, size):
+        """add_hook() callback that stops timing a phase of jello.lib"""
+        self.switch(self.stack.pop())
+
+    def phase(self, name):
+        """Returns a context manager that times its block as phase name"""
+        if not self.enabled:
+            return _NO_PROFILE_PHASE
+
+        return _ProfilePhase(self, name)
+
+    def iter(self, name, iterable):
+        """Returns an iterator over iterable that times getting each item as phase name"""
+        if not self.enabled:
+            return iterable
+
+        return self._iter(name, iter(iterable))
+
+    def _iter(self, name, iterator):
+        while True:
+            previous = self.switch(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.switch(previous)
+
+            yield item
+
+    def as_dict(self):
+        """Returns the totals and the phases of the profile (times in seconds, memory in bytes)"""
+        cpu, rss = _usage()
+        return {
+            'wall_time': time.perf_counter() - self.start_wall,
+            'cpu_time': cpu - self.start_cpu,
+            'peak_rss': rss,
+            'phases': {name: {'wall_time': wall, 'cpu_time': cpu, 'rss_growth': None if rss is None else phase_rss}
+                       for name, (wall, cpu, phase_rss) in self.phases.items()}
+        }
+
+    def report(self):
+        """Returns the profile as a table of the phases in the order they started"""
+        profile = self.as_dict()
+        wall = profile['wall_time']
+        cpu = profile['cpu_time']
+        rss = profile['peak_rss']
+        mb = 1024 * 1024
+
+        rows = [(name, phase['wall_time'], phase['cpu_time'], '-' if rss is None else f'+{phase["rss_growth"] / mb:.1f}')
+                for name, phase in profile['phases'].items()]
+
+        # argument parsing, initialization and anything else not in a phase
+        other_wall = wall - sum(row[1] for row in rows)
+        other_cpu = cpu - sum(row[2] for row in rows)
+        rows.append(('other', max(other_wall, 0.0), max(other_cpu, 0.0), ''))
+        rows.append(('total', wall, cpu, '-' if rss is None else f'{rss / mb:.1f}'))
+
+        lines = ['jello:  Profile:', f'{"":8}{"phase":<12}{"wall (s)":>10}{"cpu (s)":>10}{"max rss (MB)":>15}']
+        lines.extend(f'{"":8}{name:<12}{phase_wall:>10.3f}{phase_cpu:>10.3f}{phase_rss:>15}'
+                     for name, phase_wall, phase_cpu, phase_rss in rows)
+        return '\n'.join(lines)
+
+
+# times the phases of the run with --profile
+profiler = Profiler()
+
+
+class Metrics:
+    """
+    Counts the input and output of a run for the --metrics-file option, which appends
+    them to a JSON Lines file along with the total time and peak memory of the run
+    (and the phases timed by the profiler with --profile)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, path=None):
+        self.path = path
+        self.start = time.time()
+        self.mode = None
+        self.input_format = None
+        self.bytes_read = 0
+        self.records = 0
+        self.output_bytes = 0
+
+    def count_input(self, data):
+        """Adds the size of the data read (str data is counted as UTF-8)"""
+        if self.path:
+            self.bytes_read += len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+
+    def iter_input(self, chunks):
+        """Returns an iterator over the chunks read that adds their size"""
+        if not self.path:
+            return chunks
+
+        return self._iter_input(chunks)
+
+    def _iter_input(self, chunks):
+        for chunk in chunks:
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def count_output(self, text, newline=False):
+        """Adds the encoded size of text written to STDOUT (and the newline written after it)"""
+        if self.path:
+            encoding = getattr(sys.stdout, 'encoding', None) or 'utf-8'
+            self.output_bytes += len(text.encode(encoding, 'replace')) + newline
+
+    def write(self, exit_code):
+        """Appends the metrics of the run to the metrics file as a JSON line"""
+        record = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.start)),
+            'version': jello.__version__,
+            'mode': self.mode,
+            'input_format': self.input_format,
+            'bytes_read': self.bytes_read,
+            'records': self.records,
+            'output_bytes': self.output_bytes,
+            'exit_code': exit_code
+        }
+
+        # the phases are only timed with --profile, since switching phases for each record
+        # of --stream adds overhead. The totals only need the usage at the start and end
+        profile = profiler.as_dict()
+        if not profiler.enabled:
+            del profile['phases']
+        record.update(profile)
+
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+# counts the input and output of the run with --metrics-file
+metrics = Metrics()
+
+
+class LineProfiler:
+    """
+    Measures the time spent on each line of the query for --profile=lines. Only the
+    frames of the query (named <string>) are traced line by line. Time spent in
+    functions called from a line of the query is counted in that line.
+    """
+
+    def __init__(self):
+        self.lines = {}
+        self.line = None
+        self.time = 0.0
+        self.previous_trace = None
+
+    def start(self):
+        self.previous_trace = sys.gettrace()
+        self.time = time.perf_counter()
+        sys.settrace(self._trace)
+
+    def stop(self):
+        sys.settrace(self.previous_trace)
+        self._switch(None)
+
+    def _switch(self, line, hit=False):
+        """Stops timing the current line and starts timing line (None if the query is not running)"""
+        now = time.perf_counter()
+        if self.line is not None:
+            self.lines[self.line][1] += now - self.time
+
+        if line is not None:
+            stats = self.lines.setdefault(line, [0, 0.0])
+            if hit:
+                stats[0] += 1
+
+        self.line = line
+        self.time = now
+
+    def _trace(self, frame, event, arg):
+        if frame.f_code.co_filename != '<string>':
+            return None
+
+        return self._trace_lines
+
+    def _trace_lines(self, frame, event, arg):
+        if event == 'line':
+            self._switch(frame.f_lineno, hit=True)
+
+        elif event == 'return':
+            # continue timing the line of the query that called (or resumed) this frame, if any
+            caller = frame.f_back
+            while caller is not None and caller.f_code.co_filename != '<string>':
+                caller = caller.f_back
+
+            self._switch(None if caller is None else caller.f_lineno)
+
+        return self._trace_lines
+
+    def report(self, query):
+        """Returns the time spent on each line of the query that ran as a table"""
+        source = query.split('\n')
+        total = sum(seconds for _, seconds in self.lines.values()) or 1.0
+        width = max(shutil.get_terminal_size().columns - 48, 20)
+
+        lines = ['jello:  Query Profile:', f'{"":8}{"line":>6}{"hits":>10}{"time (s)":>12}{"%":>7}  source']
+        for line in sorted(self.lines):
+            hits, seconds = self.lines[line]
+            text = source[line - 1].strip() if 0 < line <= len(source) else ''
+            lines.append(f'{"":8}{line:>6}{hits:>10}{seconds:>12.3f}{seconds / total * 100:>7.1f}  {text[:width]}')
+
+        return '\n'.join(lines)
+
+
+def dump_query_stats(profile, path):
+    """
+    Writes the stats of a cProfile.Profile to path in the pstats format, keeping only
+    the functions of the query (named <string>) and their callers in the query
+    """
+    import pstats  # only imported when needed since it takes longer to import than jello
+
+    stats = pstats.Stats(profile)
+    stats.stats = {func: (cc, nc, tt, ct, {caller: v for caller, v in callers.items() if caller[0] == '<string>'})
+                   for func, (cc, nc, tt, ct, callers) in stats.stats.items() if func[0] == '<string>'}
+    stats.dump_stats(path)
+
+
+@contextlib.contextmanager
+def profile_query(query):
+    """
+    Profiles the lines of the query with --profile=lines and collects its cProfile
+    stats with --profile-stats while the block runs. The results are printed (or
+    written) when the block finishes without an error.
+    """
+    line_profiler = LineProfiler() if opts.profile == 'lines' else None
+    stats_profile = None
+    if opts.profile_stats:
+        import cProfile
+        stats_profile = cProfile.Profile()
+
+    if stats_profile:
+        stats_profile.enable()
+    if line_profiler:
+        line_profiler.start()
+
+    try:
+        yield
+
+    finally:
+        if line_profiler:
+            line_profiler.stop()
+        if stats_profile:
+            stats_profile.disable()
+
+    if line_profiler:
+        print(line_profiler.report(query), file=sys.stderr)
+
+    if stats_profile:
+        try:
+            dump_query_stats(stats_profile, opts.profile_stats)
+        except OSError as e:
+            print_error(f'jello:  Issue writing profile stats file: {e}')
+
+
+def bounded_text(obj, length):
+    """
+    Returns str(obj) with newlines escaped, or only its first and last length characters
+    joined by ' ... ' if it is longer than length * 2 + 10 characters. Only the characters
+    that are returned are rendered, so the time and memory it takes does not depend on
+    the size of obj.
+    """
+    limit = length * 2 + 10
+    head = _join_text(_iter_text(obj), limit + 1)
+
+    # all of the text fit in head
+    if len(head) <= limit:
+        text = head.replace('\n', '\\n')
+        if len(text) <= limit:
+            return text
+        return f'{text[:length]} ... {text[-length:]}'
+
+    tail = _join_text(_iter_text(obj, reverse=True), length, reverse=True)
+    head = head.replace('\n', '\\n')[:length]
+    tail = tail.replace('\n', '\\n')[-length:]
+    return f'{head} ... {tail}'
+
+
+def _join_text(pieces, size, reverse=False):
+    """joins text pieces until there are at least size characters (pieces from the end if reverse)"""
+    taken = []
+    total = 0
+    for piece in pieces:
+        taken.append(piece)
+        total += len(piece)
+        if total >= size:
+            break
+
+    if reverse:
+        taken.reverse()
+    return ''.join(taken)
+
+
+def _iter_text(obj, reverse=False, nested=False):
+    """
+    Yields the text of str(obj) (or repr(obj) if nested in a container) in pieces, from
+    the end if reverse. Lists, tuples, dictionaries, strings and bytes are rendered a
+    piece at a time, so the start or the end of a huge value costs no more than that of
+    a small one.
+    """
+    kind = type(obj)
+    if kind is dict or kind is list or kind is tuple:
+        opening, closing = TEXT_BRACKETS[kind]
+        if kind is dict:
+            entries = reversed(obj.items()) if reverse else obj.items()
+        else:
+            entries = reversed(obj) if reverse else obj
+
+        # a tuple with one element is written as (x,)
+        comma = ',' if kind is tuple and len(obj) == 1 else ''
+
+        yield closing if reverse else opening
+        if reverse:
+            yield comma
+
+        for n, entry in enumerate(entries):
+            if n:
+                yield ', '
+
+            if kind is dict:
+                first, second = reversed(entry) if reverse else entry
+                yield from _iter_text(first, reverse, nested=True)
+                yield ': '
+                yield from _iter_text(second, reverse, nested=True)
+            else:
+                yield from _iter_text(entry, reverse, nested=True)
+
+        if not reverse:
+            yield comma
+        yield opening if reverse else closing
+
+    elif kind is str and not nested:
+        size = len(obj)
+        starts = range(size - TEXT_SLICE, -TEXT_SLICE, -TEXT_SLICE) if reverse else range(0, size, TEXT_SLICE)
+        for start in starts:
+            yield obj[max(start, 0):start + TEXT_SLICE]
+
+    elif kind is str or kind is bytes or kind is bytearray:
+        yield from _iter_repr_slices(obj, reverse)
+
+    elif nested:
+        yield repr(obj)
+
+    else:
+        yield str(obj)
+
+
+def _iter_repr_slices(obj, reverse):
+    """
+    Yields repr() of a str, bytes or bytearray in pieces, from the end if reverse. Each
+    slice is escaped for the quote repr() uses for the whole value.
+    """
+    quote, other = ("'", '"') if isinstance(obj, str) else (b"'", b'"')
+    quote = '"' if quote in obj and other not in obj else "'"
+
+    prefix = {str: '', bytes: 'b', bytearray: 'bytearray(b'}[type(obj)]
+    suffix = ')' if type(obj) is bytearray else ''
+
+    yield quote + suffix if reverse else prefix + quote
+
+    size = len(obj)
+    starts = range(size - TEXT_SLICE, -TEXT_SLICE, -TEXT_SLICE) if reverse else range(0, size, TEXT_SLICE)
+    for start in starts:
+        text = repr(obj[max(start, 0):start + TEXT_SLICE])
+        text = text[:len(text) - len(suffix)]
+        slice_quote = text[-1]
+        text = text[text.index(slice_quote) + 1:-1]
+
+        # the slice only needs a different quote if it contains a single quote and the whole value
+        # contains both kinds of quotes, so repr() escapes the single quotes (repr() of a bytearray
+        # always escapes them)
+        if slice_quote != quote and quote == "'" and not suffix:
+            text = text.replace("'", "\\'")
+        yield text
+
+    yield prefix + quote if reverse else quote + suffix
+
+
 def print_exception(e=None, data='', query='', response='', ex_type='Runtime'):
+    if isinstance(e, BrokenPipeError):
+        exit_broken_pipe()
+
+    print_error(format_exception(e, data, query, response, ex_type))
+
+
+def format_exception(e=None, data='', query='', response='', ex_type='Runtime'):
+    """
+    Returns the error message of an exception, with the line of the query where it
+    occurred. Worker processes send it back pre-rendered, since the traceback cannot
+    be pickled.
+    """
     exception_message = ''
     term_width = shutil.get_terminal_size().columns or 80
     split_length = int(term_width)
@@ -106,23 +705,17 @@ def print_exception(e=None, data='', query='', response='', ex_type='Runtime'):
 
     detail = {
         f'{e.__class__.__name__}': e_text,
-        'query': str(query).replace('\n', '\\n'),
-        'data': str(data).replace('\n', '\\n'),
-        'response': str(response).replace('\n', '\\n')
+        'query': query,
+        'data': data,
+        'response': response
     }
 
-    for item in detail:
-        if len(detail[item]) > (split_length * 2) + 10:
-            detail[item] = f'{item}:  {detail[item][:split_length]} ... {detail[item][-split_length:]}'
-        elif detail[item]:
-            detail[item] = f'{item}:  {detail[item]}'
-
-        if detail[item]:
-            detail[item] = wrapper.fill(detail[item])
-            exception_message += f'{detail[item]}' + '\n'
+    for item, value in detail.items():
+        text = bounded_text(value, split_length)
+        if text:
+            exception_message += wrapper.fill(f'{item}:  {text}') + '\n'
 
-    print(exception_message, file=sys.stderr)
-    sys.exit(1)
+    return exception_message
 
 
 def main(data=None, query='_'):
@@ -139,12 +732,10 @@ def main(data=None, query='_'):
     if sys.platform.startswith('win32'):
         os.system('')
 
-    if data is None:
-        data = get_stdin()
-
     options = []
     long_options = {}
     arg_section = ''  # can be query_file or data_files
+    data_files = None
 
     for arg in sys.argv[1:]:
         if arg == '-q':
@@ -152,6 +743,7 @@ def main(data=None, query='_'):
 
         elif arg == '-f':
             data = ''
+            data_files = []
             arg_section = 'data_files'
 
         elif arg_section == 'query_file':
@@ -163,23 +755,20 @@ def main(data=None, query='_'):
                 arg_section = ''
 
         elif arg_section == 'data_files':
-            try:
-                data += '\n' + read_file(arg)
-            except Exception as e:
-                print_error(f'jello:  Issue reading data file: {e}')
+            data_files.append(arg)
 
         elif arg.startswith('-') and not arg.startswith('--'):
              options.extend(arg[1:])
              arg_section = ''
 
         elif arg.startswith('--'):
-            try:
-                k, v = arg[2:].split('=')
-                long_options[k] = int(v)
-                arg_section = ''
-            except Exception:
+            k, _, v = arg[2:].partition('=')
+            if k not in LONG_OPTIONS:
                 print_help()
 
+            long_options[k] = v or True
+            arg_section = ''
+
         else:
             query = arg
             arg_section = ''
@@ -197,6 +786,34 @@ def main(data=None, query='_'):
     opts.types = opts.types or 't' in options
     opts.version_info = opts.version_info or 'v' in options
     opts.helpme = opts.helpme or 'h' in options
+    opts.stream = opts.stream or any(k in long_options for k in ('stream', 'jobs', 'stream-path'))
+    opts.stream_path = long_options.get('stream-path', opts.stream_path)
+    opts.schema_summary = opts.schema_summary or 'schema-summary' in long_options
+    opts.profile = opts.profile or long_options.get('profile')
+    opts.profile_stats = opts.profile_stats or long_options.get('profile-stats')
+    opts.metrics_file = opts.metrics_file or long_options.get('metrics-file')
+
+    if opts.profile not in (None, True, 'lines'):
+        print_error('jello:  --profile can only be set to lines')
+
+    if opts.profile_stats is True:
+        print_error('jello:  --profile-stats must be set to a file name')
+
+    if opts.metrics_file is True:
+        print_error('jello:  --metrics-file must be set to a file name')
+
+    if 'format' in long_options:
+        opts.input_format = long_options['format']
+        if opts.input_format not in INPUT_FORMATS:
+            print_error(f'jello:  --format must be set to one of: {", ".join(INPUT_FORMATS)}')
+
+    if 'jobs' in long_options:
+        try:
+            opts.jobs = int(long_options['jobs'])
+            if opts.jobs < 0:
+                raise ValueError
+        except ValueError:
+            print_error('jello:  --jobs must be set to a positive integer or 0 (all CPU cores)')
 
     if opts.helpme:
         print_help()
@@ -214,58 +831,510 @@ def main(data=None, query='_'):
         '''))
         sys.exit()
 
+    profiler.reset(enabled=bool(opts.profile))
+    metrics.reset(opts.metrics_file)
+
+    # time the wrap, compile, exec, eval and unwrap phases within the query (only with
+    # --profile, since it adds more overhead to each record)
+    hook = add_hook(profiler.hook_start, profiler.hook_stop) if opts.profile else None
+
+    exit_code = 1
+    try:
+        run(data, data_files, query)
+        exit_code = 0
+
+    except SystemExit as e:
+        exit_code = e.code or 0
+        raise
+
+    finally:
+        if hook:
+            remove_hook(hook)
+
+        if metrics.path:
+            try:
+                metrics.write(exit_code)
+            except OSError as e:
+                print_error(f'jello:  Issue writing metrics file: {e}')
+
+    print_profile()
+
+
+def run(data, data_files, query):
+    """Reads, loads and queries the input and prints the results once the options are set"""
+    # stream mode reads the input lazily, one line at a time
+    if opts.stream and not opts.empty:
+        if data is None and data_files is None and sys.stdin.isatty():
+            print_error('jello:  Missing JSON or JSON Lines data via STDIN or file via -f option.\n')
+
+        sources = _iter_sources(data, data_files)
+
+        with profile_query(query):
+            if opts.jobs is not None and opts.jobs != 1:
+                metrics.mode = 'jobs'
+                jobs_main(sources, query)
+            else:
+                metrics.mode = 'stream'
+                stream_main(sources, query)
+        return
+
+    metrics.mode = 'document'
+
+    if data_files is not None:
+        # memory-map the data files so they are parsed without being copied first
+        # (the pages are read from disk as they are loaded)
+        with profiler.phase('read'):
+            buffers = []
+            for data_file in data_files:
+                try:
+                    buffers.append(map_file(data_file))
+                except Exception as e:
+                    print_error(f'jello:  Issue reading data file: {e}')
+
+            if len(buffers) == 1:
+                data = buffers[0]
+            else:
+                data = b'\n'.join(buffers)
+
+    elif data is None and not opts.empty:
+        with profiler.phase('read'):
+            data = get_stdin()
+
     if data is None and not opts.empty:
         print_error('jello:  Missing JSON or JSON Lines data via STDIN or file via -f option.\n')
 
     if opts.empty:
         data = '{}'
+    else:
+        metrics.count_input(data)
 
     # load the data as a raw string or JSON
-    if opts.raw_input:
-        data = str(data).rstrip('\r\n')
+    with profiler.phase('load'):
+        if opts.raw_input:
+            if not isinstance(data, str):
+                data = str(data, 'utf-8')
+                # binary input skips the newline translation of text mode, so do it here for the
+                # data files. Text mode STDIN only translates newlines on Windows
+                if data_files is not None or sys.platform.startswith('win32'):
+                    data = data.replace('\r\n', '\n').replace('\r', '\n')
+            data = data.rstrip('\r\n')
+            metrics.input_format = 'raw'
+
+        else:
+            # load the JSON or JSON Lines into a dict or list of dicts
+            try:
+                input_format = opts.input_format or 'auto'
+                if input_format == 'auto':
+                    input_format = detect_format(data)
+
+                metrics.input_format = input_format
+                data = load_json(data, input_format)
+            except Exception as e:
+                print_exception(e, ex_type='JSON Load')
+
+        metrics.records = len(data) if isinstance(data, list) else 1
+
+    # the lines of queries that return generators run while the output is written
+    with profile_query(query):
+        # Read .jelloconf.py (if it exists) and run the query
+        response = ''
+        with profiler.phase('query'):
+            try:
+                response = pyquery(data, query)
+            except Exception as e:
+                print_exception(e, data, query, ex_type='Query')
+
+        # reset opts.mono after pyquery since initialization in pyquery can change values
+        if opts.force_color:
+            opts.mono = False
+
+        # Create and print schema or JSON/JSON-Lines/Lines
+        try:
+            with profiler.phase('write'):
+                write_output(profiler.iter('serialize', iter_output(response)))
+
+        except Exception as e:
+            print_exception(e, data, query, response, ex_type='Output')
+
+
+def print_profile():
+    """Prints the profile of the run to STDERR with --profile"""
+    if opts.profile:
+        print(profiler.report(), file=sys.stderr)
+
+
+def color_json_output():
+    """Returns True if the JSON output is colored"""
+    return bool((not opts.mono and not opts.raw) and (sys.stdout.isatty() or opts.force_color))
+
+
+def color_schema_output():
+    """Returns True if the schema output is colored"""
+    return bool(not opts.mono and (sys.stdout.isatty() or opts.force_color))
+
+
+def format_output(response):
+    """Returns the schema or JSON/JSON-Lines/Lines representation of the response"""
+    return ''.join(iter_output(response))
+
+
+def iter_summary_output(summary):
+    """Yields the output of a SchemaSummary in chunks"""
+    color = color_schema_output()
+    if color:
+        summary.set_colors()
+
+    return summary.iter_summary(color)
+
+
+def iter_output(response):
+    """Yields the schema or JSON/JSON-Lines/Lines representation of the response in chunks"""
+    if opts.schema_summary:
+        summary = SchemaSummary()
+        summary.add(response)
+        yield from iter_summary_output(summary)
+
+    elif opts.schema:
+        schema = Schema()
+        color = color_schema_output()
+        if color:
+            schema.set_colors()
+
+        yield from schema.iter_schema(response, color)
 
     else:
-        # load the JSON or JSON Lines into a dict or list of dicts
+        json_out = Json()
+        color = color_json_output()
+        if color:
+            json_out.set_colors()
+
+        yield from json_out.iter_json(response, color)
+
+
+def write_output(chunks):
+    """
+    Writes the output chunks and a final newline to STDOUT as they are produced. The
+    chunks are encoded and written to the binary buffer, which skips the text layer
+    (unless STDOUT has no buffer, e.g. in tests, or newlines need translating).
+    """
+    stdout = sys.stdout
+    buffer = getattr(stdout, 'buffer', None)
+    watcher = StdoutWatcher()
+
+    if buffer is None or os.linesep != '\n':
+        for chunk in chunks:
+            stdout.write(chunk)
+            metrics.count_output(chunk)
+            watcher.check()
+        stdout.write('\n')
+        metrics.count_output('\n')
+        return
+
+    # anything already written to the text layer goes first
+    stdout.flush()
+    encoding = stdout.encoding
+    errors = stdout.errors
+    for chunk in chunks:
+        data = chunk.encode(encoding, errors)
+        buffer.write(data)
+        metrics.output_bytes += len(data)
+        watcher.check()
+    buffer.write(b'\n')
+    metrics.output_bytes += 1
+    buffer.flush()
+
+
+def _iter_sources(data, data_files):
+    """yield the data files, the data argument or STDIN as binary file objects"""
+    if data_files is not None:
+        for data_file in data_files:
+            try:
+                f = open(data_file, 'rb')
+            except OSError as e:
+                print_error(f'jello:  Issue reading data file: {e}')
+
+            with f:
+                yield f
+
+    elif data is None:
+        yield sys.stdin.buffer
+
+    else:
+        yield io.BytesIO(data.encode('utf-8') if isinstance(data, str) else data)
+
+
+def _source_chunks(source, chunk_size=READ_SIZE):
+    """
+    Returns the input format of a streamed source and an iterator of its chunks.
+    The format is detected from the first chunk when it is not set explicitly.
+    """
+    chunks = profiler.iter('read', metrics.iter_input(read_chunks(source, chunk_size)))
+    if opts.stream_path:
+        metrics.input_format = 'json'
+        return 'json', chunks
+
+    input_format = opts.input_format or 'auto'
+    if input_format == 'auto' and not opts.raw_input:
+        first_chunk = next(chunks, b'')
+        input_format = detect_format(first_chunk)
+        chunks = itertools.chain([first_chunk], chunks)
+
+    metrics.input_format = 'raw' if opts.raw_input else input_format
+    return input_format, chunks
+
+
+def _iter_records(sources):
+    """
+    yield the records of the streamed sources: the lines (-R), the JSON Lines or the
+    elements of a JSON array
+    """
+    stream_path = opts.stream_path.split('.') if opts.stream_path else None
+
+    for source in sources:
+        input_format, chunks = _source_chunks(source)
+
+        if opts.raw_input:
+            for chunk in iter_line_chunks(chunks):
+                yield from (str(line, 'utf-8') for line in chunk.splitlines())
+
+        elif input_format == 'jsonl':
+            yield from iter_json_lines(line for chunk in iter_line_chunks(chunks) for line in chunk.splitlines())
+
+        else:
+            yield from iter_json_array(chunks, stream_path)
+
+
+def stream_main(sources, query):
+    """
+    Loads, queries and prints JSON Lines or JSON array input one record at a time so
+    memory use does not depend on the size of the input. Each result is printed as a
+    JSON Line.
+    """
+    if not opts.lines:
+        opts.compact = True
+
+    record = ''
+    records = profiler.iter('load', _iter_records(sources))
+    watcher = StdoutWatcher()
+
+    def checked_records():
+        nonlocal record
+        while True:
+            watcher.check()
+            try:
+                record = next(records)
+            except StopIteration:
+                return
+            except Exception as e:
+                print_exception(e, ex_type='JSON Load')
+
+            metrics.records += 1
+            yield record
+
+    results = profiler.iter('query', pyquery_stream(checked_records(), query))
+
+    def checked_results():
+        while True:
+            try:
+                response = next(results)
+            except StopIteration:
+                return
+            except Exception as e:
+                print_exception(e, record, query, ex_type='Query')
+
+            # reset opts.mono after pyquery since initialization in pyquery can change values
+            if opts.force_color:
+                opts.mono = False
+
+            yield response
+
+    # the results of all records are summarized as one array
+    if opts.schema_summary:
+        try:
+            with profiler.phase('write'):
+                write_output(profiler.iter('serialize', iter_output(checked_results())))
+        except Exception as e:
+            print_exception(e, record, query, ex_type='Output')
+        return
+
+    for response in checked_results():
         try:
-            data = load_json(data)
+            with profiler.phase('serialize'):
+                output = format_output(response)
+            if output:
+                with profiler.phase('write'):
+                    print(output)
+                    metrics.count_output(output, newline=True)
+
         except Exception as e:
-            print_exception(e, ex_type='JSON Load')
+            print_exception(e, record, query, response, ex_type='Output')
+
+
+def _init_worker(query, options):
+    """
+    Worker process initializer. Restores the options from the main process and
+    compiles the query once for the lifetime of the worker.
+    """
+    for k, v in options.items():
+        setattr(opts, k, v)
 
-    # Read .jelloconf.py (if it exists) and run the query
+    _init_worker.query = Query(query)
+
+
+def _process_chunk(chunk):
+    """
+    Runs the query against each record in the chunk within a worker process. The
+    chunk is either JSON Lines (bytes) or a list of records that are already loaded.
+    Returns a list of output strings (or a SchemaSummary of the results with
+    --schema-summary), the number of records and the error message on failure (the
+    outputs are those of the records before the failure).
+    """
+    outputs = SchemaSummary() if opts.schema_summary else []
+    records = 0
+    record = ''
     response = ''
+    ex_type = 'JSON Load'
     try:
-        response = pyquery(data, query)
+        for line in (chunk if isinstance(chunk, list) else chunk.splitlines()):
+            ex_type = 'JSON Load'
+            record = ''
+            if isinstance(chunk, list):
+                record = line
+            elif opts.raw_input:
+                record = str(line, 'utf-8')
+            elif line.strip():
+                record = json.loads(line)
+            else:
+                continue
+
+            records += 1
+            ex_type = 'Query'
+            response = _init_worker.query.run(record)
+
+            if opts.force_color:
+                opts.mono = False
+
+            ex_type = 'Output'
+            if opts.schema_summary:
+                outputs.add_item(response)
+                continue
+
+            output = format_output(response)
+            if output:
+                outputs.append(output)
+
+    # the same details as the errors of --stream
     except Exception as e:
-        print_exception(e, data, query, ex_type='Query')
+        if ex_type == 'JSON Load':
+            return outputs, records, format_exception(e, ex_type=ex_type)
 
-    # reset opts.mono after pyquery since initialization in pyquery can change values
-    if opts.force_color:
-        opts.mono = False
+        if ex_type == 'Query':
+            return outputs, records, format_exception(e, record, _init_worker.query.query, ex_type=ex_type)
 
-    # Create and print schema or JSON/JSON-Lines/Lines
-    output = ''
-    try:
-        if opts.schema:
-            schema = Schema()
-            output = schema.create_schema(response)
+        return outputs, records, format_exception(e, record, _init_worker.query.query, response, ex_type=ex_type)
+
+    return outputs, records, None
+
+
+def _iter_jobs_chunks(sources):
+    """
+    yield the chunks of work for the worker processes: JSON Lines split at line
+    boundaries, or batches of records loaded from a JSON array
+    """
+    stream_path = opts.stream_path.split('.') if opts.stream_path else None
+
+    for source in sources:
+        input_format, chunks = _source_chunks(source, CHUNK_SIZE)
 
-            if not opts.mono and (sys.stdout.isatty() or opts.force_color):
-                schema.set_colors()
-                output = schema.color_output(output)
+        if opts.raw_input or input_format == 'jsonl':
+            yield from iter_line_chunks(chunks)
 
         else:
-            json_out = Json()
-            output = json_out.create_json(response)
+            records = iter_json_array(chunks, stream_path)
+            while True:
+                try:
+                    batch = list(itertools.islice(records, BATCH_SIZE))
+                except Exception as e:
+                    print_exception(e, ex_type='JSON Load')
 
-            if (not opts.mono and not opts.raw) and (sys.stdout.isatty() or opts.force_color):
-                json_out.set_colors()
-                output = json_out.color_output(output)
+                if not batch:
+                    break
+                yield batch
 
-        print(output)
 
-    except Exception as e:
-        print_exception(e, data, query, response, ex_type='Output')
+def jobs_main(sources, query):
+    """
+    Splits the input into chunks at line boundaries (or into batches of records for
+    JSON arrays) and processes them in a pool of worker processes. Results are
+    printed in the same order as the input. With --schema-summary, the summaries of
+    the chunks are merged and printed at the end.
+    """
+    if not opts.lines:
+        opts.compact = True
+
+    jobs = opts.jobs or os.cpu_count() or 1
+    options = {k: v for k, v in vars(opts).items() if not k.startswith('__')}
+
+    # the results of all records are summarized as one array
+    summary = None
+    if opts.schema_summary:
+        summary = SchemaSummary()
+        summary.add_items(())
+
+    # a closed STDOUT must raise BrokenPipeError instead of killing the process, so the
+    # worker processes are stopped before exiting. need try/except for windows compatibility
+    try:
+        signal.signal(signal.SIGPIPE, signal.SIG_IGN)
+    except AttributeError:
+        pass
+
+    # keep a bounded number of chunks in flight so memory does not grow with the input size
+    pending = deque()
+    watcher = StdoutWatcher()
+    pool = multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(query, options))
+    try:
+        chunks = profiler.iter('load', _iter_jobs_chunks(sources))
+        while True:
+            watcher.check()
+
+            while len(pending) < jobs * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(pool.apply_async(_process_chunk, (chunk,)))
+
+            if not pending:
+                break
+
+            with profiler.phase('workers'):
+                outputs, records, error = pending.popleft().get()
+            metrics.records += records
+
+            if summary is not None:
+                if not error:
+                    with profiler.phase('serialize'):
+                        summary.merge(outputs)
+
+            elif outputs:
+                with profiler.phase('write'):
+                    output = '\n'.join(outputs)
+                    print(output)
+                    metrics.count_output(output, newline=True)
+
+            if error:
+                sys.stdout.flush()
+                print_error(error)
+
+        if summary is not None:
+            with profiler.phase('write'):
+                write_output(profiler.iter('serialize', iter_summary_output(summary)))
+
+    except BrokenPipeError:
+        exit_broken_pipe()
 
+    finally:
+        pool.terminate()
+        pool.join()
 
 if __name__ == '__main__':
     main()
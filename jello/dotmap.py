@@ -16,10 +16,13 @@
 # IN THE SOFTWARE.
 
 
-# Note: commented out code on lines 52-55 and 79-82. Changes on line 122-125
+# Note: commented out code on lines 52-55 and 62-65. Changes on line 123-126
+# Nested dicts and the dicts in lists are converted to DotMap lazily, when they are accessed.
+# A DotMap keeps a reference to the dict it was created from and toDict() returns it when nothing changed.
+# Uses __slots__ and a plain dict (ordered since Python 3.7) instead of an OrderedDict to save memory per node.
 
 
-from collections import OrderedDict
+from copy import deepcopy
 try:
     from collections.abc import MutableMapping, Iterable
 except ImportError:
@@ -29,20 +32,31 @@ from pprint import pprint
 from inspect import ismethod
 
 
-class DotMap(MutableMapping, OrderedDict):
+class DotMap(MutableMapping, dict):
+    # the state added for lazy conversion is name-mangled, so it cannot hide keys of the data
+    __slots__ = ('_map', '_dynamic', '_prevent_method_masking', '__wrapped_lists', '__source', '__dirty', '__converted')
+
     def __init__(self, *args, **kwargs):
-        self._map = OrderedDict()
+        self._map = {}
         self._dynamic = kwargs.pop('_dynamic', True)
         self._prevent_method_masking = kwargs.pop('_prevent_method_masking', False)
-        trackedIDs = kwargs.pop('_trackedIDs', {})
+        # keys of the list values whose dicts have already been converted to DotMap (a set, once needed)
+        self.__wrapped_lists = None
+        # the plain dict this map was created from, whether keys were set or deleted since,
+        # and whether any values were converted to DotMap
+        self.__source = None
+        self.__dirty = False
+        self.__converted = False
 
         if args:
             d = args[0]
-            # for recursive assignment handling
-            trackedIDs[id(d)] = self
 
             src = []
-            if isinstance(d, MutableMapping):
+            if type(d) is dict:
+                if not kwargs:
+                    self.__source = d
+                self._map = dict(d)
+            elif isinstance(d, MutableMapping):
                 src = self.__call_items(d)
             elif isinstance(d, Iterable):
                 src = d
@@ -52,26 +66,6 @@ class DotMap(MutableMapping, OrderedDict):
                 # still raise an exception when attempting to create them later.
                 # if self._prevent_method_masking and k in reserved_keys:
                 #     raise KeyError('"{}" is reserved'.format(k))
-                if isinstance(v, dict):
-                    idv = id(v)
-                    if idv in trackedIDs:
-                        v = trackedIDs[idv]
-                    else:
-                        trackedIDs[idv] = v
-                        v = self.__class__(v, _dynamic=self._dynamic, _prevent_method_masking = self._prevent_method_masking, _trackedIDs = trackedIDs)
-                if type(v) is list:
-                    l = []
-                    for i in v:
-                        n = i
-                        if isinstance(i, dict):
-                            idi = id(i)
-                            if idi in trackedIDs:
-                                n = trackedIDs[idi]
-                            else:
-                                trackedIDs[idi] = i
-                                n = self.__class__(i, _dynamic=self._dynamic, _prevent_method_masking = self._prevent_method_masking)
-                        l.append(n)
-                    v = l
                 self._map[k] = v
         if kwargs:
             for k,v in self.__call_items(kwargs):
@@ -87,10 +81,30 @@ class DotMap(MutableMapping, OrderedDict):
         else:
             return obj.items()
 
+    def __wrap(self, k):
+        """converts a plain dict value, or the dicts in a list value, to DotMap on first access"""
+        v = self._map[k]
+        if type(v) is dict:
+            self.__converted = True
+            v = self._map[k] = self.__class__(v, _dynamic=self._dynamic, _prevent_method_masking=self._prevent_method_masking)
+        elif type(v) is list and (self.__wrapped_lists is None or k not in self.__wrapped_lists):
+            self.__converted = True
+            v = self._map[k] = [self.__class__(i, _dynamic=self._dynamic, _prevent_method_masking=self._prevent_method_masking)
+                                if type(i) is dict else i for i in v]
+            if self.__wrapped_lists is None:
+                self.__wrapped_lists = set()
+            self.__wrapped_lists.add(k)
+        return v
+
+    def __wrap_all(self):
+        for k in self._map:
+            self.__wrap(k)
+
     def items(self):
         return self.iteritems()
 
     def iteritems(self):
+        self.__wrap_all()
         return self.__call_items(self._map)
 
     def __iter__(self):
@@ -100,42 +114,49 @@ class DotMap(MutableMapping, OrderedDict):
         return self._map.next()
 
     def __setitem__(self, k, v):
+        if self.__wrapped_lists:
+            self.__wrapped_lists.discard(k)
+        self.__dirty = True
         self._map[k] = v
 
     def __getitem__(self, k):
-        if k not in self._map and self._dynamic and k != '_ipython_canary_method_should_not_exist_':
+        m = self._map
+        if k in m:
+            v = m[k]
+            # only dicts and lists need converting
+            if type(v) is dict or type(v) is list:
+                return self.__wrap(k)
+            return v
+        if self._dynamic and k != '_ipython_canary_method_should_not_exist_':
             # automatically extend to new DotMap
             self[k] = self.__class__()
-        return self._map[k]
+        return self.__wrap(k)
 
     def __setattr__(self, k, v):
-        if k in {'_map','_dynamic', '_ipython_canary_method_should_not_exist_', '_prevent_method_masking'}:
-            super(DotMap, self).__setattr__(k,v)
+        if k in slot_names:
+            object.__setattr__(self, k, v)
         elif self._prevent_method_masking and k in reserved_keys:
             raise KeyError('"{}" is reserved'.format(k))
         else:
             self[k] = v
 
     def __getattr__(self, k):
-        if k.startswith('__') and k.endswith('__'):
+        # Python only calls this after the normal lookup failed, so methods and other class
+        # attributes never get here. Checking the precomputed names is enough, without
+        # retrying the lookup and catching the AttributeError.
+        if k in protected_names:
+            if k in slot_names or k == '_ipython_canary_method_should_not_exist_':
+                # a slot that is not set yet, e.g. while unpickling
+                raise AttributeError(k)
             raise AttributeError(f'{k} is reserved. Please use python dict bracket notation for this key.')
-        
-        if self._prevent_method_masking and k in reserved_keys:
-            raise AttributeError(f'{k} is reserved. Please use python dict bracket notation for this key.')
-
-        if k in {'_map','_dynamic','_ipython_canary_method_should_not_exist_'}:
-            return super(DotMap, self).__getattr__(k)
 
-        try:
-            v = super(self.__class__, self).__getattribute__(k)
-            return v
-        except AttributeError:
-            pass
+        if k[:2] == '__' and k[-2:] == '__':
+            raise AttributeError(f'{k} is reserved. Please use python dict bracket notation for this key.')
 
         return self[k]
 
     def __delattr__(self, key):
-        return self._map.__delitem__(key)
+        return self.__delitem__(key)
 
     def __contains__(self, k):
         return self._map.__contains__(k)
@@ -152,7 +173,8 @@ class DotMap(MutableMapping, OrderedDict):
     def __str__(self, seen = None):
         items = []
         seen = {id(self)} if seen is None else seen
-        for k,v in self.__call_items(self._map):
+        # items() converts the values first, so they print as DotMaps whether or not they were accessed
+        for k,v in self.items():
             # circular assignment case
             if isinstance(v, self.__class__):
                 if id(v) in seen:
@@ -173,12 +195,21 @@ class DotMap(MutableMapping, OrderedDict):
         if seen is None:
             seen = {}
 
+        src = self.__source
+        unchanged = src is not None and not self.__dirty
+        if unchanged and not self.__converted:
+            return src
+
         d = {}
 
         seen[id(self)] = d
 
-        for k,v in self.items():
-            if issubclass(type(v), DotMap):
+        # plain dicts are subtrees that were never accessed, so they pass straight through
+        for k,v in self._map.items():
+            orig = src.get(k) if src is not None else None
+            if v is orig:
+                pass
+            elif issubclass(type(v), DotMap):
                 idv = id(v)
                 if idv in seen:
                     v = seen[idv]
@@ -195,11 +226,21 @@ class DotMap(MutableMapping, OrderedDict):
                         else:
                             n = i.toDict(seen = seen)
                     l.append(n)
-                if type(v) is tuple:
+                # a list whose items all came back unchanged is the source list
+                if type(orig) is type(v) and len(orig) == len(l) and all(a is b for a,b in zip(l, orig)):
+                    v = orig
+                elif type(v) is tuple:
                     v = tuple(l)
                 else:
                     v = l
+            if v is not orig:
+                unchanged = False
             d[k] = v
+
+        # nothing was modified, so the source dict can be returned without a copy
+        if unchanged:
+            seen[id(self)] = src
+            return src
         return d
 
     def pprint(self, pformat='dict'):
@@ -213,6 +254,7 @@ class DotMap(MutableMapping, OrderedDict):
 
     # proper dict subclassing
     def values(self):
+        self.__wrap_all()
         return self._map.values()
 
     # ipython support
@@ -250,19 +292,27 @@ class DotMap(MutableMapping, OrderedDict):
         return self._map.__ne__(other)
 
     def __delitem__(self, key):
+        if self.__wrapped_lists:
+            self.__wrapped_lists.discard(key)
+        self.__dirty = True
         return self._map.__delitem__(key)
     def __len__(self):
         return self._map.__len__()
     def clear(self):
+        self.__wrapped_lists = None
+        self.__dirty = True
         self._map.clear()
     def copy(self):
-        return self.__class__(self)
+        # start from the plain dicts, so the nested maps are not shared with the copy
+        return self.__class__(self.toDict())
     def __copy__(self):
         return self.copy()
     def __deepcopy__(self, memo=None):
-        return self.copy()
+        return self.__class__(deepcopy(self.toDict(), memo), _dynamic=self._dynamic, _prevent_method_masking=self._prevent_method_masking)
     def get(self, key, default=None):
-        return self._map.get(key, default)
+        if key not in self._map:
+            return default
+        return self.__wrap(key)
     def has_key(self, key):
         return key in self._map
     def iterkeys(self):
@@ -272,15 +322,27 @@ class DotMap(MutableMapping, OrderedDict):
     def keys(self):
         return self._map.keys()
     def pop(self, key, default=None):
-        return self._map.pop(key, default)
+        if key not in self._map:
+            return default
+        v = self.__wrap(key)
+        self.__delitem__(key)
+        return v
     def popitem(self):
-        return self._map.popitem()
+        if not self._map:
+            raise KeyError('popitem(): dictionary is empty')
+        k = next(reversed(self._map))
+        return k, self.pop(k)
     def setdefault(self, key, default=None):
-        return self._map.setdefault(key, default)
+        if key not in self._map:
+            self[key] = default
+        return self.__wrap(key)
     def update(self, *args, **kwargs):
         if len(args) != 0:
             self._map.update(*args)
         self._map.update(kwargs)
+        self.__dirty = True
+        # new list values can hold plain dicts, so check them all again on access
+        self.__wrapped_lists = None
     def viewitems(self):
         return self._map.viewitems()
     def viewkeys(self):
@@ -290,10 +352,14 @@ class DotMap(MutableMapping, OrderedDict):
     @classmethod
     def fromkeys(cls, seq, value=None):
         d = cls()
-        d._map = OrderedDict.fromkeys(seq, value)
+        d._map = dict.fromkeys(seq, value)
         return d
-    def __getstate__(self): return self.__dict__
-    def __setstate__(self, d): self.__dict__.update(d)
+    def __reduce__(self):
+        return (self.__class__, (), self.__getstate__())
+    def __getstate__(self): return {k: getattr(self, k) for k in slot_names}
+    def __setstate__(self, d):
+        for k,v in d.items():
+            object.__setattr__(self, k, v)
     # bannerStr
     def _getListStr(self,items):
         out = '['
@@ -368,4 +434,10 @@ class DotMap(MutableMapping, OrderedDict):
         s = '\n'.join(lines)
         return s
 
-reserved_keys = {i for i in dir(DotMap) if not i.startswith('__') and not i.endswith('__')}
+# the attribute names of the slots, as Python stores the mangled ones
+slot_names = frozenset(f'_DotMap{k}' if k.startswith('__') else k for k in DotMap.__slots__)
+
+reserved_keys = {i for i in dir(DotMap) if not i.startswith('__') and not i.endswith('__') and i not in slot_names}
+
+# names __getattr__ must not look up in the map
+protected_names = frozenset(reserved_keys | slot_names | {'_ipython_canary_method_should_not_exist_'})
@@ -1,11 +1,19 @@
 """jello - query JSON at the command line with python syntax"""
 
 import os
+import re
 import sys
+import mmap
+import stat
 import types
 import ast
 import json
+import codecs
+import itertools
+import functools
 import shutil
+import time
+from collections.abc import Iterator
 from keyword import iskeyword
 from textwrap import TextWrapper
 from jello.dotmap import DotMap
@@ -24,19 +32,206 @@ except Exception:
     PYGMENTS_INSTALLED = False
 
 
+# size of the chunks read from STDIN and data files
+READ_SIZE = 1024 * 1024
+
+_json_decoder = json.JSONDecoder()
+_compact_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+# first non-whitespace character, using the JSON definition of whitespace
+_NON_WHITESPACE = re.compile(r'[^ \t\r\n]')
+_NON_WHITESPACE_BYTES = re.compile(rb'[^ \t\r\n]')
+
+# rest of a number that was cut off at the end of a chunk (may be empty)
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+INPUT_FORMATS = ('auto', 'json', 'jsonl')
+
+# number of list items or dictionary entries encoded at a time for JSON output
+OUTPUT_BATCH = 1000
+
+# containers with up to this many items (e.g. {"meta": ..., "data": [...]}) are split at their
+# items for JSON output when they hold more than OUTPUT_BATCH values, so the large containers
+# in them are encoded in batches as well
+OUTPUT_SPLIT_ITEMS = 64
+
+# types of the values _count_values() counts the values of
+_CONTAINER_TYPES = frozenset((dict, list, tuple))
+
+# number of object keys whose schema path suffix (.key or ["key"]) is cached
+SCHEMA_KEY_CACHE = 4096
+
+# column of the type counts in --schema-summary output
+SUMMARY_COLUMN = 64
+
+# instrumentation hooks registered with add_hook(): (start, stop) callback pairs
+_hooks = []
+
+# depth change and line break for each bracket token of pretty_json()
+_BRACKET_DEPTH = {'{': 1, '[': 1, '}': -1, ']': -1}
+_BRACKET_LINES = {'{': '{\n', '[': '[\n', '}': '\n}', ']': '\n]'}
+
+# ANSI color codes of the theme colors. These are the codes Pygments' Terminal256Formatter
+# uses, including its 'white', which is the code for bold.
+_ANSI_COLORS = {color: str(30 + n) for n, color in enumerate(
+    ('black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'gray'))}
+_ANSI_COLORS.update({color: str(90 + n) for n, color in enumerate(
+    ('brightblack', 'brightred', 'brightgreen', 'brightyellow', 'brightblue', 'brightmagenta',
+     'brightcyan'))})
+_ANSI_COLORS['white'] = '01'
+
+# numbers (including the NaN and Infinity extensions) and keywords between the strings
+# of JSON text, and the kind of token by its first character
+_JSON_TOKEN = re.compile(r'([-0-9IN][0-9A-Za-z.+-]*|[tfn][a-z]+)')
+_JSON_TOKEN_KINDS = dict.fromkeys('-0123456789IN', 'number')
+_JSON_TOKEN_KINDS.update(dict.fromkeys('tfn', 'keyword'))
+
+
+_DICT_METHODS = frozenset([
+    '__class__', '__class_getitem__', '__contains__', '__delattr__',
+    '__delitem__', '__dir__', '__eq__', '__format__', '__ge__',
+    '__getattribute__', '__getitem__', '__getstate__', '__gt__',
+    '__init__', '__init_subclass__', '__ior__', '__iter__', '__le__',
+    '__len__', '__lt__', '__ne__', '__new__', '__or__', '__reduce__',
+    '__reduce_ex__', '__repr__', '__reversed__', '__ror__', '__setattr__',
+    '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 'clear',
+    'copy', 'fromkeys', 'get', 'items', 'keys', 'pop', 'popitem',
+    'setdefault', 'update', 'values'
+])
+
+
+def add_hook(start=None, stop=None):
+    """
+    Registers instrumentation callbacks for the phases of loading, querying and
+    serializing data, so tracing or metrics can be connected when jello is embedded:
+
+        load       load_json() (size: bytes, or characters for str data)
+        wrap       converting the data to DotMap (size: items in the list or dict)
+        compile    compiling the query (size: characters in the query)
+        exec       running the statements of the query
+        eval       evaluating the last expression of the query
+        unwrap     converting the result back to normal dicts
+        serialize  creating JSON or schema output (size: characters of output)
+
+    start(phase) is called when a phase starts and stop(phase, seconds, size) when it
+    ends, even if it raises an exception. size is None when it does not apply. The
+    phases are not timed when no hooks are registered. Returns a handle for
+    remove_hook().
+    """
+    hook = (start, stop)
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """Unregisters the callbacks of a handle returned by add_hook()"""
+    _hooks.remove(hook)
+
+
+def _hooked(phase, size, func, *args):
+    """Returns func(*args), calling the hooks when the phase starts and stops"""
+    for start, _ in _hooks:
+        if start is not None:
+            start(phase)
+
+    started = time.perf_counter()
+    try:
+        return func(*args)
+
+    finally:
+        seconds = time.perf_counter() - started
+        for _, stop in _hooks:
+            if stop is not None:
+                stop(phase, seconds, size)
+
+
+def _hooked_chunks(phase, chunks):
+    """
+    Yields the output chunks, calling the hooks when the phase starts and stops. Only
+    the time spent producing the chunks is counted, and the size is their length.
+    """
+    for start, _ in _hooks:
+        if start is not None:
+            start(phase)
+
+    iterator = iter(chunks)
+    seconds = 0.0
+    size = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - started
+
+            size += len(chunk)
+            yield chunk
+
+    finally:
+        for _, stop in _hooks:
+            if stop is not None:
+                stop(phase, seconds, size)
+
+
 def is_valid_variable_name(name: str) -> bool:
-    dict_methods = [
-        '__class__', '__class_getitem__', '__contains__', '__delattr__',
-        '__delitem__', '__dir__', '__eq__', '__format__', '__ge__',
-        '__getattribute__', '__getitem__', '__getstate__', '__gt__',
-        '__init__', '__init_subclass__', '__ior__', '__iter__', '__le__',
-        '__len__', '__lt__', '__ne__', '__new__', '__or__', '__reduce__',
-        '__reduce_ex__', '__repr__', '__reversed__', '__ror__', '__setattr__',
-        '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 'clear',
-        'copy', 'fromkeys', 'get', 'items', 'keys', 'pop', 'popitem',
-        'setdefault', 'update', 'values'
-    ]
-    return name.isidentifier() and not iskeyword(name) and name not in dict_methods
+    return name.isidentifier() and not iskeyword(name) and name not in _DICT_METHODS
+
+
+@functools.lru_cache(maxsize=SCHEMA_KEY_CACHE)
+def _schema_key(k):
+    """returns the schema path suffix of a key: .key, or ["key"] if it is not a valid variable name"""
+    if is_valid_variable_name(k):
+        return f'.{k}'
+    return f'["{k}"]'
+
+
+# -t type annotations of the values that are not lists or dictionaries, by type
+_SCHEMA_TYPES = {
+    bool: '// (boolean)',
+    type(None): '//    (null)',
+    int: '//  (number)',
+    float: '//  (number)',
+    str: '//  (string)'
+}
+
+
+def _schema_type(value):
+    """returns the -t type annotation of a subclass of a JSON type (e.g. an IntEnum)"""
+    if isinstance(value, bool):
+        return _SCHEMA_TYPES[bool]
+    if isinstance(value, (int, float)):
+        return _SCHEMA_TYPES[int]
+    return _SCHEMA_TYPES[str]
+
+
+# --schema-summary type names, by type
+_SUMMARY_TYPES = {
+    dict: 'object',
+    list: 'array',
+    str: 'string',
+    int: 'number',
+    float: 'number',
+    bool: 'boolean',
+    type(None): 'null'
+}
+
+
+def _summary_type(value):
+    """returns the --schema-summary type name of a subclass of a JSON type (e.g. an OrderedDict)"""
+    if isinstance(value, dict):
+        return 'object'
+    if isinstance(value, (list, tuple)):
+        return 'array'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
 
 
 class opts:
@@ -52,7 +247,15 @@ class opts:
     force_color = None
     mono = None
     schema = None
+    schema_summary = None
     types = None
+    stream = None
+    jobs = None
+    input_format = None
+    stream_path = None
+    profile = None
+    profile_stats = None
+    metrics_file = None
     keyname_color = None
     keyword_color = None
     number_color = None
@@ -127,13 +330,30 @@ class JelloTheme:
                 String: f'ansi{color_list[3]}' if not color_list[3] == 'default' else self.theme[String]
             }
 
+    def ansi_colors(self):
+        """
+        Returns a dictionary with the (start, end) ANSI escape codes of the theme colors
+        for the 'key', 'keyword', 'number' and 'string' tokens. These are the same codes
+        Pygments' Terminal256Formatter writes for the theme.
+        """
+        def codes(style):
+            *bold, color = style.split()
+            code = _ANSI_COLORS[color[len('ansi'):]]
+            if bold:
+                return f'\x1b[{code};01m', '\x1b[39;00m'
+            return f'\x1b[{code}m', '\x1b[39m'
+
+        return {
+            'key': codes(self.theme[Name]),
+            'keyword': codes(self.theme[Keyword]),
+            'number': codes(self.theme[Number]),
+            'string': codes(self.theme[String])
+        }
+
 
 class Schema(JelloTheme):
     """Inherits theme and set_colors() from JelloTheme"""
 
-    def __init__(self):
-        self._schema_list = []
-
     def color_output(self, data):
         if not opts.mono and PYGMENTS_INSTALLED:
             class JelloStyle(Style):
@@ -154,112 +374,226 @@ class Schema(JelloTheme):
         formatter = HtmlFormatter(style=JelloStyle, noclasses=True)
         return highlight(data, lexer, formatter)
 
-    def create_schema(self, data):
-        self._schema_gen(data)
-        myschema = '\n'.join(self._schema_list)
-        # unsure if this is helpful, but trying to reduce memory footprint by clearing the list
-        self._schema_list *= 0
-        return myschema
+    def create_schema(self, data, color=False):
+        return ''.join(self.iter_schema(data, color))
 
-    def _schema_gen(self, src, path='_'):
+    def iter_schema(self, data, color=False):
+        """
+        Yields the output of create_schema() in chunks of up to OUTPUT_BATCH lines, so
+        the schema is written as it is generated. With color, each chunk is colored
+        with color_output() (call set_colors() first).
         """
-        Creates a grep-able schema representation of the JSON.
-        This method is recursive, and output is stored within self._schema_list (list).
+        chunks = self._iter_schema(data, color)
+        return _hooked_chunks('serialize', chunks) if _hooks else chunks
+
+    def _iter_schema(self, data, color=False):
+        lines = self._iter_schema_lines(data)
+        separator = ''
+        while True:
+            chunk = '\n'.join(itertools.islice(lines, OUTPUT_BATCH))
+            if not chunk:
+                if not separator:
+                    yield ''
+                return
+
+            yield separator + (self.color_output(chunk) if color else chunk)
+            separator = '\n'
+
+    def _iter_schema_lines(self, data):
         """
-        if isinstance(src, list):
-            # print empty brackets as first list definition
-            val = '[]'
-            val_type = ''
-            padding = ''
-            if opts.types:
-                val_type = '//   (array)'
-                padding = '  '
-                if len(path) + len(val) + len(val_type) < 76:
-                    padding = ' ' * (76 - (len(path) + len(val) + len(val_type)))
-
-            self._schema_list.append(f'{path} = {val};{padding}{val_type}')
+        Yields the lines of a grep-able schema representation of the JSON. Instead of
+        recursing, the children of each list and dictionary are visited with an
+        iterator on a stack, so deep documents do not hit the recursion limit and only
+        the path to the current value is held in memory. The elements of an iterator
+        are listed as the elements of a list.
+        """
+        schema_line = self._schema_line
+        children = self._schema_children
+        encode = _compact_encoder.encode
 
-            for i, item in enumerate(src):
-                self._schema_gen(item, path=f'{path}[{i}]')
+        if isinstance(data, Iterator):
+            yield schema_line('_', '[]', '//   (array)')
+            stack = [children('_', data)]
+        else:
+            stack = [iter([('_', data)])]
 
-        elif isinstance(src, dict):
-            # print empty curly brackets as first object definition
-            val = '{}'
-            val_type = ''
-            padding = ''
-            if opts.types:
-                val_type = '//  (object)'
-                padding = '  '
-                if len(path) + len(val) + len(val_type) < 76:
-                    padding = ' ' * (76 - (len(path) + len(val) + len(val_type)))
+        while stack:
+            for path, src in stack[-1]:
+                if isinstance(src, list):
+                    # print empty brackets as first list definition
+                    yield schema_line(path, '[]', '//   (array)')
+                    stack.append(children(path, src))
+                    break
+
+                if isinstance(src, dict):
+                    # print empty curly brackets as first object definition
+                    yield schema_line(path, '{}', '//  (object)')
+                    stack.append(children(path, src))
+                    break
 
-            self._schema_list.append(f'{path} = {val};{padding}{val_type}')
+                val = encode(src)
+                val_type = (_SCHEMA_TYPES.get(type(src)) or _schema_type(src)) if opts.types else ''
+                yield schema_line(path, val, val_type)
+
+            else:
+                stack.pop()
 
+    @staticmethod
+    def _schema_children(path, src):
+        """yields the path and value of each element of a list (or iterator) or dictionary"""
+        if isinstance(src, dict):
             for k, v in src.items():
-                # encapsulate key in brackets if it is not a valid variable name
-                if is_valid_variable_name(k):
-                    k = f'.{k}'
-                else:
-                    k = f'["{k}"]'
+                yield path + _schema_key(k), v
+        else:
+            for i, item in enumerate(src):
+                yield f'{path}[{i}]', item
 
-                if isinstance(v, list):
-                    # print empty brackets as first list definition
-                    val = '[]'
-                    val_type = ''
-                    padding = ''
-                    if opts.types:
-                        val_type = '//   (array)'
-                        padding = '  '
-                        if len(path) + len(val) + len(val_type) < 76:
-                            padding = ' ' * (76 - (len(f'{path}{k}') + len(val) + len(val_type)))
+    @staticmethod
+    def _schema_line(path, val, val_type):
+        """returns the schema line of a value, with the type annotation aligned if -t is used"""
+        if not opts.types:
+            return f'{path} = {val};'
 
-                    self._schema_list.append(f'{path}{k} = {val};{padding}{val_type}')
+        padding = '  '
+        if len(path) + len(val) + len(val_type) < 76:
+            padding = ' ' * (76 - (len(path) + len(val) + len(val_type)))
 
-                    for i, item in enumerate(v):
-                        self._schema_gen(item, path=f'{path}{k}[{i}]')
+        return f'{path} = {val};{padding}{val_type}'
 
-                elif isinstance(v, dict):
-                    self._schema_gen(v, path=f'{path}{k}')
 
-                else:
-                    val = json.dumps(v, ensure_ascii=False)
-                    val_type = ''
-                    padding = ''
-                    if opts.types:
-                        if val == 'true' or val == 'false':
-                            val_type = '// (boolean)'
-                        elif val == 'null':
-                            val_type = '//    (null)'
-                        elif val.replace('.', '', 1).isdigit():
-                            val_type = '//  (number)'
-                        else:
-                            val_type = '//  (string)'
-
-                        padding = '  '
-                        if len(path) + len(k) + len(val) + len(val_type) < 76:
-                            padding = ' ' * (76 - (len(path) + len(k) + len(val) + len(val_type)))
-
-                    self._schema_list.append(f'{path}{k} = {val};{padding}{val_type}')
+class _SummaryNode:
+    """The type counts of a --schema-summary path, with the paths of its keys and array elements"""
+    __slots__ = ('types', 'keys', 'items')
+
+    def __init__(self):
+        self.types = {}
+        self.keys = {}
+        self.items = None
+
 
+class SchemaSummary(Schema):
+    """
+    Collapsed schema of one or more values. The elements of arrays are merged into
+    [*] paths, and the types found at each path are counted. Only the paths are held
+    in memory, so values can be added one at a time (e.g. the records of JSON Lines)
+    and any number of them can be summarized in bounded memory.
+
+    Inherits theme, set_colors() and color_output() from Schema
+    """
+
+    def __init__(self):
+        self._root = _SummaryNode()
+
+    def add(self, value):
+        """Adds a value at the '_' path. Iterators are added as arrays, one element at a time."""
+        if isinstance(value, Iterator):
+            self.add_items(value)
         else:
-            val = json.dumps(src, ensure_ascii=False)
-            val_type = ''
-            padding = ''
-            if opts.types:
-                if val == 'true' or val == 'false':
-                    val_type = '// (boolean)'
-                elif val == 'null':
-                    val_type = '//    (null)'
-                elif val.replace('.', '', 1).isdigit():
-                    val_type = '//  (number)'
-                else:
-                    val_type = '//  (string)'
+            self._add(self._root, value)
+
+    def add_items(self, values):
+        """Adds an array at the '_' path from an iterable of its elements"""
+        types = self._root.types
+        types['array'] = types.get('array', 0) + 1
+        for value in values:
+            self.add_item(value)
+
+    def add_item(self, value):
+        """Adds one element of the array at the '_' path (see add_items())"""
+        if self._root.items is None:
+            self._root.items = _SummaryNode()
+        self._add(self._root.items, value)
+
+    @staticmethod
+    def _add(node, value):
+        """counts the types of a value and everything in it, without recursion"""
+        stack = [(node, value)]
+        while stack:
+            node, value = stack.pop()
+            name = _SUMMARY_TYPES.get(type(value)) or _summary_type(value)
+            types = node.types
+            types[name] = types.get(name, 0) + 1
+
+            # children are pushed in reverse, so types and keys are counted in the order they appear
+            if name == 'object':
+                keys = node.keys
+                children = []
+                for k, v in value.items():
+                    child = keys.get(k)
+                    if child is None:
+                        child = keys[k] = _SummaryNode()
+                    children.append((child, v))
+                stack.extend(reversed(children))
+
+            elif name == 'array':
+                if node.items is None:
+                    node.items = _SummaryNode()
+                stack.extend(zip(itertools.repeat(node.items), reversed(value)))
+
+    def merge(self, other):
+        """Adds the counts of another SchemaSummary (e.g. one created by a worker process)"""
+        stack = [(self._root, other._root)]
+        while stack:
+            node, other_node = stack.pop()
+            for name, count in other_node.types.items():
+                node.types[name] = node.types.get(name, 0) + count
+
+            for k, other_child in other_node.keys.items():
+                child = node.keys.get(k)
+                if child is None:
+                    child = node.keys[k] = _SummaryNode()
+                stack.append((child, other_child))
+
+            if other_node.items is not None:
+                if node.items is None:
+                    node.items = _SummaryNode()
+                stack.append((node.items, other_node.items))
+
+    def create_summary(self, color=False):
+        return ''.join(self.iter_summary(color))
+
+    def iter_summary(self, color=False):
+        """
+        Yields the summary in chunks of up to OUTPUT_BATCH lines, one line per path with
+        the number of times each type was found there, e.g.:
 
-                padding = '  '
-                if len(path) + len(val) + len(val_type) < 76:
-                    padding = ' ' * (76 - (len(path) + len(val) + len(val_type)))
+            _[*].id;                                                        // number: 1000
 
-            self._schema_list.append(f'{path} = {val};{padding}{val_type}')
+        With color, each chunk is colored with color_output() (call set_colors() first).
+        """
+        chunks = self._iter_summary(color)
+        return _hooked_chunks('serialize', chunks) if _hooks else chunks
+
+    def _iter_summary(self, color=False):
+        lines = self._iter_summary_lines()
+        separator = ''
+        while True:
+            chunk = '\n'.join(itertools.islice(lines, OUTPUT_BATCH))
+            if not chunk:
+                if not separator:
+                    yield ''
+                return
+
+            yield separator + (self.color_output(chunk) if color else chunk)
+            separator = '\n'
+
+    def _iter_summary_lines(self):
+        """yields the summary line of each path that was found, keys before array elements"""
+        stack = [('_', self._root)]
+        while stack:
+            path, node = stack.pop()
+
+            # the root has no types if only add_item() was used
+            if node.types:
+                line = f'{path};'
+                padding = ' ' * max(SUMMARY_COLUMN - len(line), 2)
+                counts = ', '.join(f'{name}: {count}' for name, count in node.types.items())
+                yield f'{line}{padding}// {counts}'
+
+            # pushed in reverse, so they are visited in the order they were found
+            if node.items is not None:
+                stack.append((f'{path}[*]', node.items))
+            stack.extend(reversed([(path + _schema_key(k), child) for k, child in node.keys.items()]))
 
 
 class Json(JelloTheme):
@@ -285,61 +619,60 @@ class Json(JelloTheme):
         formatter = HtmlFormatter(style=JelloStyle, noclasses=True)
         return highlight(data, lexer, formatter)
 
-    def create_json(self, data):
-        separators = None
-        indent = 2
+    def create_json(self, data, color=False):
+        return ''.join(self.iter_json(data, color))
 
-        if opts.compact or opts.lines:
-            separators = (',', ':')
-            indent = None
+    def iter_json(self, data, color=False):
+        """
+        Yields the output of create_json() in chunks, so large lists and dictionaries
+        are encoded and written a batch of items at a time. With color, each chunk is
+        colored with the theme colors (see set_colors()) by color_json().
+        """
+        chunks = self._iter_json(data, color)
+        return _hooked_chunks('serialize', chunks) if _hooks else chunks
+
+    def _iter_json(self, data, color=False):
+        pretty = not (opts.compact or opts.lines)
+        colors = self.ansi_colors() if color and not opts.mono and PYGMENTS_INSTALLED else None
 
         if isinstance(data, dict):
-            return json.dumps(data, separators=separators, indent=indent, ensure_ascii=False)
+            yield from _color_chunks(_iter_json_container(data, pretty), colors)
 
-        if isinstance(data, list):
+        elif isinstance(data, list):
             if not opts.lines:
-                return json.dumps(data, separators=separators, indent=indent, ensure_ascii=False)
+                yield from _color_chunks(_iter_json_container(data, pretty), colors)
 
             # print lines
             else:
-                flat_list = ''
-                for entry in data:
-                    if entry is None:
-                        if opts.nulls:
-                            flat_list += 'null\n'
-                        else:
-                            flat_list += '\n'
-
-                    elif isinstance(entry, (dict, list, bool, int, float)):
-                        flat_list += json.dumps(entry, separators=separators, ensure_ascii=False) + '\n'
-
-                    elif isinstance(entry, str):
-                        # replace \n with \\n here so lines with newlines literally print the \n char
-                        entry = entry.replace('\n', '\\n')
-                        if opts.raw:
-                            flat_list += f'{entry}' + '\n'
-                        else:
-                            flat_list += f'"{entry}"' + '\n'
-
-                return flat_list.rstrip()
+                yield from self.iter_lines(data, color)
 
         # naked single item return case
         elif data is None:
             if opts.nulls:
-                return 'null'
+                yield from _color_chunks(['null'], colors)
             else:
-                return ''
+                yield ''
 
         elif isinstance(data, (bool, int, float)):
-            return json.dumps(data, ensure_ascii=False)
+            yield from _color_chunks([json.dumps(data, ensure_ascii=False)], colors)
 
         elif isinstance(data, str):
             # replace \n with \\n here so lines with newlines literally print the \n char
             data = data.replace('\n', '\\n')
             if opts.raw:
-                return f'{data}'
+                yield f'{data}'
+            elif colors:
+                start, end = colors['string']
+                yield f'{start}"{data}"{end}'
+            else:
+                yield f'"{data}"'
+
+        # generators and other iterators are consumed lazily, one element per line
+        elif isinstance(data, Iterator):
+            if opts.lines:
+                yield from self.iter_lines(data, color)
             else:
-                return f'"{data}"'
+                yield from _color_chunks(_iter_json_lines_output(data), colors)
 
         # only non-serializable types are left. Force an exception from json.dumps()
         else:
@@ -347,19 +680,577 @@ class Json(JelloTheme):
             # this code should not run, but just in case something slips by above
             raise TypeError(f'Object is not JSON serializable')
 
+    def iter_lines(self, entries, color=False):
+        """
+        Yields the -l output of a list or iterator, one line per entry. The chunks start
+        with one line and double up to OUTPUT_BATCH lines, so the first results are
+        written right away. Trailing whitespace is held back until more output follows,
+        so the result is the same as stripping the trailing whitespace of the whole output.
+        """
+        encode = _compact_encoder.encode
+        colors = self.ansi_colors() if color and not opts.mono and PYGMENTS_INSTALLED else None
+        lines = []
+        strings = []
+        pending = []
+        size = 1
+
+        for entry in entries:
+            if entry is None:
+                if opts.nulls:
+                    line = 'null\n'
+                else:
+                    line = '\n'
+
+            elif isinstance(entry, (dict, list, bool, int, float)):
+                line = encode(entry) + '\n'
+
+            elif isinstance(entry, str):
+                # replace \n with \\n here so lines with newlines literally print the \n char
+                entry = entry.replace('\n', '\\n')
+                if opts.raw:
+                    line = f'{entry}' + '\n'
+                else:
+                    line = f'"{entry}"' + '\n'
+
+            else:
+                continue
+
+            text = line.rstrip()
+            if text:
+                lines.extend(pending)
+                pending.clear()
+                if colors and isinstance(entry, str):
+                    strings.append(len(lines))
+                lines.append(text)
+                pending.append(line[len(text):])
+
+                if len(lines) >= size:
+                    yield _color_lines(lines, strings, colors) if colors else ''.join(lines)
+                    lines.clear()
+                    strings.clear()
+                    size = min(size * 2, OUTPUT_BATCH)
+
+            else:
+                pending.append(line)
+
+        yield _color_lines(lines, strings, colors) if colors else ''.join(lines)
+
+
+def pretty_json(data):
+    """
+    Same output as json.dumps(data, indent=2, ensure_ascii=False), but encoded at C speed.
+
+    json.dumps() falls back to the pure-Python encoder whenever indent is set. Instead,
+    the C encoder puts each item on its own line (control characters are always
+    escaped inside JSON strings, so a raw newline can only be a separator). Then the
+    text is split at the brackets and each line is indented by the bracket depth in
+    one pass of C-level map() calls.
+    """
+    text = json.dumps(data, separators=(',\n', ': '), ensure_ascii=False)
+
+    # set escaped backslashes and quotes aside, so every remaining quote delimits a string.
+    # \x00-\x04 never appear raw in JSON output.
+    escapes = '\\' in text
+    if escapes:
+        text = text.replace('\\\\', '\x03').replace('\\"', '\x04')
+
+    # empty containers stay on one line
+    text = (text.replace('{}', '\x01').replace('[]', '\x02')
+            .replace('{', '\x00{\x00').replace('[', '\x00[\x00')
+            .replace('}', '\x00}\x00').replace(']', '\x00]\x00'))
+    tokens = text.split('\x00')
+
+    # a bracket inside a string leaves an odd number of quotes between two brackets.
+    # Those (rare) documents use the slower encoder.
+    if 1 in map(int.__and__, map(str.count, tokens[0::2], itertools.repeat('"')), itertools.repeat(1)):
+        return json.dumps(data, indent=2, ensure_ascii=False)
+
+    depths = list(itertools.accumulate(map(_BRACKET_DEPTH.get, tokens, itertools.repeat(0))))
+    newlines = ['\n' + '  ' * depth for depth in range(max(depths) + 1)]
+
+    # brackets get their line break, then every line break is indented to its depth
+    lines = map(str.replace, map(_BRACKET_LINES.get, tokens, tokens),
+                itertools.repeat('\n'), map(newlines.__getitem__, depths))
+    text = ''.join(lines).replace('\x01', '{}').replace('\x02', '[]')
+
+    if escapes:
+        text = text.replace('\x04', '\\"').replace('\x03', '\\\\')
+    return text
+
+
+def color_json(text, colors):
+    """
+    Colors JSON text from the encoder with the ANSI codes returned by
+    JelloTheme.ansi_colors(). The result is the same as highlighting the text with
+    Pygments' JsonLexer and Terminal256Formatter, but nothing is lexed: as in
+    pretty_json(), every quote left after setting escapes aside delimits a string, so
+    the text is split at the quotes. The text between the strings is split at the
+    numbers and keywords with one regex, and strings followed by a colon are keys.
+    """
+    escapes = '\\' in text
+    if escapes:
+        text = text.replace('\\\\', '\x03').replace('\\"', '\x04')
+
+    parts = text.split('"')
+
+    # split the text between the strings (in one piece) at the numbers and keywords, and
+    # put the codes for the kind of token around each one
+    pieces = _JSON_TOKEN.split('\x05'.join(parts[0::2]))
+    tokens = pieces[1::2]
+    first_chars = list(map(str.__getitem__, tokens, itertools.repeat(0)))
+    token_starts = {char: colors[kind][0] for char, kind in _JSON_TOKEN_KINDS.items()}
+    token_ends = {char: colors[kind][1] for char, kind in _JSON_TOKEN_KINDS.items()}
+    between = ''.join(itertools.chain.from_iterable(zip(
+        pieces[0::2], map(token_starts.__getitem__, first_chars), tokens, map(token_ends.__getitem__, first_chars))))
+    between = (between + pieces[-1]).split('\x05')
+
+    # a string followed by a colon is a key
+    is_key = list(map(str.startswith, parts[2::2], itertools.repeat(':')))
+    string_start, string_end = colors['string']
+    key_start, key_end = colors['key']
+    starts = map((string_start + '"', key_start + '"').__getitem__, is_key)
+    ends = map(('"' + string_end, '"' + key_end).__getitem__, is_key)
+
+    text = ''.join(itertools.chain.from_iterable(zip(between, starts, parts[1::2], ends))) + between[-1]
+
+    if escapes:
+        text = text.replace('\x04', '\\"').replace('\x03', '\\\\')
+    return text
+
+
+def _color_chunks(chunks, colors):
+    """Colors each chunk of JSON text with color_json(), unless colors is None"""
+    if colors is None:
+        return chunks
+    return map(color_json, chunks, itertools.repeat(colors))
+
+
+def _color_lines(lines, strings, colors):
+    """
+    Joins and colors -l output lines. The lines at the indexes in strings are strings,
+    which are not JSON encoded (quotes are not escaped), so they are colored whole and
+    the JSON lines between them are colored in one piece by color_json().
+    """
+    start, end = colors['string']
+    chunks = []
+    previous = 0
+    for n in strings:
+        chunks.append(color_json(''.join(lines[previous:n]), colors))
+        chunks.append(start + lines[n] + end)
+        previous = n + 1
+
+    chunks.append(color_json(''.join(lines[previous:]), colors))
+    return ''.join(chunks)
+
+
+def _count_values(data, limit):
+    """
+    Returns the number of values in a dict or list, counting the values of nested
+    containers as well. Counts one level of nesting at a time and stops once there
+    are more than limit, so the values of large containers are not gathered.
+    """
+    count = 0
+    level = [data]
+    while level and count <= limit:
+        count += sum(map(len, level))
+        values = list(itertools.chain.from_iterable(v.values() if type(v) is dict else v for v in level))
+        level = list(itertools.compress(values, map(_CONTAINER_TYPES.__contains__, map(type, values))))
+    return count
+
+
+def _iter_json_container(data, pretty, depth=0):
+    """
+    Yields the JSON of a dict or list in chunks of OUTPUT_BATCH items. Each batch is
+    encoded as a whole and its brackets are replaced, so the output is the same as
+    encoding the container at once. A container with up to OUTPUT_SPLIT_ITEMS items
+    that holds more than OUTPUT_BATCH values in all (e.g. {"data": [...]}) is split
+    at its items instead, and the nested containers that are too large are yielded
+    in chunks the same way, indented by their depth.
+    """
+    if pretty:
+        newline = '\n' + '  ' * depth
+        if depth:
+            # the lines of a nested container are indented by its depth
+            def encode(data):
+                return pretty_json(data).replace('\n', newline)
+        else:
+            encode = pretty_json
+        item_indent = '  '
+        key_separator = ': '
+    else:
+        encode = _compact_encoder.encode
+        newline = ''
+        item_indent = ''
+        key_separator = ':'
+
+    is_dict = isinstance(data, dict)
+    opening, closing = ('{', '}') if is_dict else ('[', ']')
+
+    # pretty batches start with '[' and a newline and end with a newline and ']' (the
+    # newlines are indented by the depth), compact ones with '[' and ']'
+    strip = len(newline) + 1
+
+    if len(data) > OUTPUT_BATCH:
+        if is_dict:
+            items = iter(data.items())
+            batches = iter(lambda: dict(itertools.islice(items, OUTPUT_BATCH)), {})
+        else:
+            batches = (data[i:i + OUTPUT_BATCH] for i in range(0, len(data), OUTPUT_BATCH))
+
+        yield opening
+        for n, batch in enumerate(batches):
+            body = newline + encode(batch)[strip:-strip]
+            yield ',' + body if n else body
+        yield newline + closing
+        return
+
+    if len(data) > OUTPUT_SPLIT_ITEMS or _count_values(data, OUTPUT_BATCH) <= OUTPUT_BATCH:
+        yield encode(data)
+        return
+
+    # the items that are not large containers are encoded together, up to OUTPUT_BATCH values at a time
+    group = []
+    size = 0
+    separator = ''
+    yield opening
+    for item in (data.items() if is_dict else data):
+        value = item[1] if is_dict else item
+        count = _count_values(value, OUTPUT_BATCH) if type(value) in _CONTAINER_TYPES else 1
+        if count <= OUTPUT_BATCH:
+            group.append(item)
+            size += count
+            if size <= OUTPUT_BATCH:
+                continue
+
+        if group:
+            batch = dict(group) if is_dict else group
+            yield separator + newline + encode(batch)[strip:-strip]
+            separator = ','
+            group = []
+            size = 0
+
+        if count > OUTPUT_BATCH:
+            # the key is encoded in a dict, since JSON converts keys that are not strings
+            key = _compact_encoder.encode({item[0]: 0})[1:-3] + key_separator if is_dict else ''
+            yield separator + newline + item_indent + key
+            yield from _iter_json_container(value, pretty, depth + 1)
+            separator = ','
+
+    if group:
+        batch = dict(group) if is_dict else group
+        yield separator + newline + encode(batch)[strip:-strip]
+    yield newline + closing
+
+
+def _iter_json_lines_output(data):
+    """
+    Yields the elements of an iterator as JSON Lines. The chunks start with one line
+    and double up to OUTPUT_BATCH lines, so the first results are written right away.
+    """
+    encode = _compact_encoder.encode
+    size = 1
+    separator = ''
+    while True:
+        batch = list(itertools.islice(data, size))
+        if not batch:
+            return
+        yield separator + '\n'.join(map(encode, batch))
+        separator = '\n'
+        size = min(size * 2, OUTPUT_BATCH)
+
+
+def iter_json_lines(lines):
+    """Yields a python object for each non-blank line of JSON Lines input (str or bytes lines)"""
+    decode = _json_decoder.decode
+    for line in lines:
+        if line.strip():
+            if not isinstance(line, str):
+                # JSON Lines is always UTF-8, so skip the encoding detection of json.loads()
+                line = str(line, 'utf-8', 'surrogatepass')
+            yield decode(line)
+
+
+def iter_buffer_lines(data):
+    """
+    Yields each line of a bytes-like object (bytes, bytearray, mmap) as bytes without
+    splitting the whole buffer at once.
+    """
+    start = 0
+    end = len(data)
+    while start < end:
+        newline = data.find(b'\n', start)
+        if newline == -1:
+            newline = end
+        yield data[start:newline]
+        start = newline + 1
+
+
+def _decode_json(data):
+    """json.loads() for str and bytes-like objects, including memory-mapped files"""
+    if isinstance(data, (str, bytes, bytearray)):
+        return json.loads(data)
+
+    # decode straight from the buffer to avoid an intermediate bytes copy of the file
+    text = str(data, json.detect_encoding(data[:4]), 'surrogatepass')
+
+    # the mapped pages are not needed while parsing, so let the OS drop them from RSS
+    if isinstance(data, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+        data.madvise(mmap.MADV_DONTNEED)
+
+    return json.loads(text)
+
+
+class _JsonReader:
+    """
+    Decodes JSON values from an iterable of str or bytes chunks with
+    json.JSONDecoder.raw_decode() over a sliding buffer. Only the text of the value
+    being decoded (and the unread rest of the current chunk) is held in memory.
+    Decode errors report the line, column and char from the start of the input.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = None
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # chars and lines before the buffer, and the index of the last newline before it
+        self.offset = 0
+        self.lines = 0
+        self.newline = -1
+
+    def _read(self):
+        """
+        Reads at least one more chunk and at least doubles the unread text, so values
+        larger than a chunk are retried a logarithmic number of times. Returns False
+        at the end of the input.
+        """
+        if self.eof:
+            return False
+
+        read = self.buf[:self.pos]
+        newlines = read.count('\n')
+        if newlines:
+            self.lines += newlines
+            self.newline = self.offset + read.rindex('\n')
+        self.offset += self.pos
+
+        parts = [self.buf[self.pos:]]
+        size = target = max(len(parts[0]), 1)
+        while size <= target:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                if self._utf8:
+                    parts.append(self._utf8.decode(b'', final=True))
+                break
+
+            if not isinstance(chunk, str):
+                if self._utf8 is None:
+                    self._utf8 = codecs.getincrementaldecoder('utf-8')('surrogatepass')
+                chunk = self._utf8.decode(chunk)
+
+            parts.append(chunk)
+            size += len(chunk)
+
+        self.buf = ''.join(parts)
+        self.pos = 0
+        return True
+
+    def error(self, msg, pos):
+        """Returns a JSONDecodeError at pos in the buffer, with the position in the whole input"""
+        lineno = self.lines + self.buf.count('\n', 0, pos) + 1
+        newline = self.buf.rfind('\n', 0, pos)
+        newline = self.offset + newline if newline != -1 else self.newline
+
+        e = json.JSONDecodeError(msg, self.buf, pos)
+        e.pos = self.offset + pos
+        e.lineno = lineno
+        e.colno = e.pos - newline
+        e.args = (f'{msg}: line {e.lineno} column {e.colno} (char {e.pos})',)
+        return e
+
+    def peek(self):
+        """skips whitespace and returns the next character, or '' at the end of the input"""
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+
+            self.pos = len(self.buf)
+            if not self._read():
+                return ''
+
+    def expect(self, chars):
+        """consumes and returns the next character, which must be one of chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            expected = ' or '.join(repr(c) for c in chars)
+            raise self.error(f'Expecting {expected}', self.pos)
+
+        self.pos += 1
+        return char
+
+    def value(self):
+        """decodes and returns the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # errors close to the end of the buffer (or in an unterminated string) can
+                # just mean the value continues in the next chunk
+                incomplete = e.msg.startswith('Unterminated string') or e.pos >= len(self.buf) - 16
+                if incomplete and self._read():
+                    continue
+                raise self.error(e.msg, e.pos) from None
+
+            # a number at the end of the buffer may continue in the next chunk
+            if _NUMBER_TAIL.fullmatch(self.buf, end) and self._read():
+                continue
+
+            self.pos = end
+            return value
+
+    def seek(self, path):
+        """moves to the value found by following the keys (or array indexes) in path"""
+        for key in path:
+            char = self.expect('{[')
+            if char == '{':
+                while self.peek() != '}':
+                    name = self.value()
+                    self.expect(':')
+                    if name == key:
+                        break
+
+                    self.value()
+                    if self.expect(',}') == '}':
+                        self.pos -= 1
+                else:
+                    raise KeyError(key)
+
+            else:
+                if not key.isdigit():
+                    raise TypeError(f'Array found at "{key}" in the path. Use an index instead.')
+
+                for _ in range(int(key)):
+                    if self.peek() == ']':
+                        raise IndexError(f'Array index out of range in the path: {key}')
+                    self.value()
+                    if self.expect(',]') == ']':
+                        raise IndexError(f'Array index out of range in the path: {key}')
+
+                if self.peek() == ']':
+                    raise IndexError(f'Array index out of range in the path: {key}')
+
+
+def iter_json_array(chunks, path=None):
+    """
+    Incrementally decodes JSON from an iterable of str or bytes chunks and yields the
+    elements of the top-level array one at a time, so huge arrays can be processed in
+    bounded memory.
+
+    path is an optional list of keys (or array indexes as digit strings) leading to a
+    nested array to stream instead, e.g. ['data', 'items']. The rest of the document
+    after that array is not read.
+
+    Without a path, a top-level value that is not an array is yielded as a single
+    record, followed by any other top-level values (e.g. concatenated JSON).
+    """
+    reader = _JsonReader(chunks)
+
+    if path:
+        reader.seek(path)
+        if reader.peek() != '[':
+            raise TypeError(f'The value at "{".".join(path)}" is not an array.')
+
+    elif reader.peek() != '[':
+        while reader.peek():
+            yield reader.value()
+        return
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+
+    else:
+        while True:
+            yield reader.value()
+            if reader.expect(',]') == ']':
+                break
+
+    if not path and reader.peek():
+        raise reader.error('Extra data', reader.pos)
+
+
+def detect_format(data):
+    """
+    Sniffs the start of the data and returns 'jsonl' if the first non-blank line is a
+    complete JSON value followed by more data, otherwise 'json'. At most the first
+    line is parsed. A valid JSON document can never look like JSON Lines, since a
+    complete value followed by more data is not valid JSON. Blank data is 'jsonl',
+    so it loads as an empty list.
+    """
+    if isinstance(data, str):
+        non_whitespace = _NON_WHITESPACE
+        newline = '\n'
+    else:
+        non_whitespace = _NON_WHITESPACE_BYTES
+        newline = b'\n'
+
+    first_char = non_whitespace.search(data)
+    if not first_char:
+        return 'jsonl'
+
+    start = first_char.start()
+    end = data.find(newline, start)
+    if end == -1 or not non_whitespace.search(data, end):
+        return 'json'
 
-def load_json(data):
     try:
-        json_dict = json.loads(data)
-    except Exception as e:
-        try:
-            # if json.loads fails, try loading as json lines
-            json_dict = [json.loads(i) for i in data.splitlines() if i.strip()]
-        except Exception:
-            # raise original JSON exception instead of JSON Lines exception
-            raise e
+        first_line = data[start:end]
+        if not isinstance(first_line, str):
+            first_line = str(first_line, 'utf-8', 'surrogatepass')
+
+        first_line = first_line.rstrip(' \t\r')
+        _, pos = _json_decoder.raw_decode(first_line)
+    except ValueError:
+        return 'json'
+
+    return 'jsonl' if pos == len(first_line) else 'json'
 
-    return json_dict
+
+def load_json(data, input_format='auto'):
+    """
+    Loads JSON or JSON Lines data into a python object. data can be a str or a
+    bytes-like object such as the mmap returned by map_file().
+
+    input_format can be 'json', 'jsonl' or 'auto'. With 'auto' the format is
+    detected with detect_format() so the data is only parsed once.
+    """
+    if _hooks:
+        return _hooked('load', len(data), _load_json, data, input_format)
+
+    return _load_json(data, input_format)
+
+
+def _load_json(data, input_format):
+    if input_format == 'auto':
+        input_format = detect_format(data)
+
+    if input_format == 'json':
+        return _decode_json(data)
+
+    if input_format == 'jsonl':
+        if isinstance(data, str):
+            lines = data.splitlines()
+        else:
+            lines = iter_buffer_lines(data)
+
+        return list(iter_json_lines(lines))
+
+    raise ValueError(f'Unknown input format: {input_format}. Use one of: {", ".join(INPUT_FORMATS)}')
 
 
 def warning_message(message_lines):
@@ -393,27 +1284,92 @@ def warning_message(message_lines):
         message = next_wrapper.fill(line)
         print(message, file=sys.stderr)
 
+
+def read_chunks(f, chunk_size=READ_SIZE):
+    """Yields the chunks of a binary stream until the end of the stream"""
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_stream(f, chunk_size=READ_SIZE):
+    """
+    Reads a binary stream to the end in large chunks. The chunks are appended to a
+    single bytearray so the data is never held as both a list of chunks and the
+    joined result, and it is never decoded to a str.
+    """
+    data = bytearray()
+    for chunk in read_chunks(f, chunk_size):
+        data += chunk
+    return data
+
+
+def iter_line_chunks(chunks):
+    """
+    Re-splits an iterable of bytes chunks at line boundaries, so every chunk
+    yielded holds only complete lines.
+    """
+    remainder = b''
+    for chunk in chunks:
+        chunk = remainder + chunk
+        last_newline = chunk.rfind(b'\n')
+        if last_newline == -1:
+            remainder = chunk
+            continue
+
+        remainder = chunk[last_newline + 1:]
+        yield chunk[:last_newline + 1]
+
+    if remainder:
+        yield remainder
+
+
 def read_file(file_path):
     with open(file_path, 'r') as f:
         return f.read()
 
-def pyquery(data, query, add_to_scope=None):
-    """Sets options and runs the user's query."""
-    output = None
 
-    # read data into '_' variable
-    # if data is a list of dictionaries, then need to iterate through and convert all dictionaries to DotMap
+def map_file(file_path):
+    """
+    Returns a read-only memory map of a data file so it can be parsed without first
+    being read, decoded and copied into a str. Files that cannot be mapped (empty
+    files, pipes, etc.) are read into bytes instead.
+    """
+    with open(file_path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+            try:
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                pass
+
+        return f.read()
+
+
+def _wrap_data(data):
+    """Converts the input data (or each dictionary in a list) to DotMap so dot notation can be used"""
     if isinstance(data, list):
-        _ = [DotMap(i, _dynamic=False, _prevent_method_masking=True) if isinstance(i, dict)
-             else i for i in data]
+        return [DotMap(i, _dynamic=False, _prevent_method_masking=True) if isinstance(i, dict)
+                else i for i in data]
 
     elif isinstance(data, dict):
-        _ = DotMap(data, _dynamic=False, _prevent_method_masking=True)
+        return DotMap(data, _dynamic=False, _prevent_method_masking=True)
 
-    else:
-        _ = data
+    return data
 
-    # read initialization file to set colors, options, and user-defined functions
+
+def _item_count(data):
+    """Returns the number of items in a list or dict (the size of the wrap phase for hooks)"""
+    return len(data) if isinstance(data, (list, dict)) else None
+
+
+def _init_scope(_, add_to_scope=None):
+    """
+    Reads the initialization file (if -i is used), validates the options and colors it sets,
+    and returns the scope the query will be run in.
+    """
     jelloconf = ''
     conf_file = ''
     jcnf_dict = {}
@@ -436,8 +1392,9 @@ def pyquery(data, query, add_to_scope=None):
             jelloconf = conf_prepend + jelloconf
 
             # create and import the modified .jelloconf file as a normal module
+            # (compiled with its own file name so only the frames of the query are named <string>)
             jcnf = types.ModuleType('jcnf')
-            exec(jelloconf, jcnf.__dict__)
+            exec(compile(jelloconf, conf_file, 'exec'), jcnf.__dict__)
             jcnf_dict = {f: getattr(jcnf, f) for f in dir(jcnf) if not f.startswith('__')}
 
         except FileNotFoundError:
@@ -479,22 +1436,78 @@ def pyquery(data, query, add_to_scope=None):
     if add_to_scope is not None:
         scope.update(add_to_scope)
 
-    # run the query
+    return scope
+
+
+def _compile_query(query):
+    """
+    Compiles the query into a code object for the statements and a code object for
+    the final expression. The result can be reused to run the query many times.
+    """
     block = ast.parse(query, mode='exec')
 
     if len(block.body) < 1:
         raise ValueError('No query found.')
 
     last = ast.Expression(block.body.pop().value)    # assumes last node is an expression
-    exec(compile(block, '<string>', mode='exec'), scope)
-    output = eval(compile(last, '<string>', mode='eval'), scope)
+    return compile(block, '<string>', mode='exec'), compile(last, '<string>', mode='eval')
+
+
+def _unwrap(obj):
+    """
+    Converts DotMaps back to normal dicts, including DotMaps inside lists and dicts
+    built by the query. Unmodified DotMaps return the input dict they were created
+    from, and containers with nothing to convert are returned as-is, so read-only
+    parts of the input are not copied.
+    """
+    if isinstance(obj, DotMap):
+        return obj.toDict()
+
+    if type(obj) in (list, tuple):
+        items = None
+        for n, i in enumerate(obj):
+            new = _unwrap(i)
+            if items is None and new is not i:
+                items = list(obj[:n])
+            if items is not None:
+                items.append(new)
+
+        if items is None:
+            return obj
+        return items if type(obj) is list else tuple(items)
+
+    if type(obj) is dict:
+        values = None
+        for n, (k, v) in enumerate(obj.items()):
+            new = _unwrap(v)
+            if values is None and new is not v:
+                values = dict(itertools.islice(obj.items(), n))
+            if values is not None:
+                values[k] = new
+
+        return obj if values is None else values
+
+    return obj
+
+
+def _run_query(compiled_query, scope):
+    """Runs a compiled query within the scope and converts the output back to normal dicts"""
+    body, last = compiled_query
+    if _hooks:
+        _hooked('exec', None, exec, body, scope)
+        output = _hooked('eval', None, eval, last, scope)
+        output = _hooked('unwrap', None, _unwrap, output)
+
+    else:
+        exec(body, scope)
+        output = eval(last, scope)
 
-    # convert output back to normal dict
-    if isinstance(output, list):
-        output = [i.toDict() if isinstance(i, DotMap) else i for i in output]
+        # convert output back to normal dict
+        output = _unwrap(output)
 
-    elif isinstance(output, DotMap):
-        output = output.toDict()
+    # the elements of generators and other iterators are converted as they are consumed
+    if isinstance(output, Iterator):
+        output = map(_unwrap, output)
 
     # if DotMap returns a bound function then we know it was a reserved attribute name
     if hasattr(output, '__self__'):
@@ -503,5 +1516,56 @@ def pyquery(data, query, add_to_scope=None):
     return output
 
 
+def pyquery(data, query, add_to_scope=None):
+    """Sets options and runs the user's query."""
+    # read data into '_' variable
+    _ = _hooked('wrap', _item_count(data), _wrap_data, data) if _hooks else _wrap_data(data)
+
+    # read initialization file to set colors, options, and user-defined functions
+    scope = _init_scope(_, add_to_scope)
+
+    # run the query
+    compiled_query = _hooked('compile', len(query), _compile_query, query) if _hooks else _compile_query(query)
+    return _run_query(compiled_query, scope)
+
+
+class Query:
+    """
+    A query that is compiled once and can then be run against many records. The
+    initialization file is read when the first record is run.
+    """
+
+    def __init__(self, query, add_to_scope=None):
+        self.query = query
+        self.add_to_scope = add_to_scope
+        self._compiled_query = None
+        self._base_scope = None
+
+    def run(self, data):
+        _ = _hooked('wrap', _item_count(data), _wrap_data, data) if _hooks else _wrap_data(data)
+
+        if self._compiled_query is None:
+            self._base_scope = _init_scope(_, self.add_to_scope)
+            self._compiled_query = (_hooked('compile', len(self.query), _compile_query, self.query) if _hooks
+                                    else _compile_query(self.query))
+
+        # each record gets a fresh scope so variables do not leak between records
+        scope = dict(self._base_scope)
+        scope['_'] = _
+        return _run_query(self._compiled_query, scope)
+
+
+def pyquery_stream(records, query, add_to_scope=None):
+    """
+    Runs the user's query against each record from an iterable (e.g. JSON Lines) and
+    yields the results one at a time. The query is compiled and the initialization
+    file is read only once, when the first record arrives.
+    """
+    compiled_query = Query(query, add_to_scope)
+
+    for record in records:
+        yield compiled_query.run(record)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,10 @@
+#!/bin/bash
+# Runs the benchmark suite and saves the results in benchmark-results/, named after
+# the current commit. Extra arguments are passed to the suite, e.g. to compare with
+# an earlier run:
+#
+#   ./runbenchmarks.sh --compare benchmark-results/<commit>.json
+
+mkdir -p benchmark-results
+commit=$(git rev-parse --short HEAD 2>/dev/null || echo local)
+python3 -m tests.benchmarks.suite --output "benchmark-results/${commit}.json" "$@"
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Compares colored JSON output from color_json() with coloring by Pygments and with
+uncolored output, for the default (pretty) and the -l (JSON Lines) formats. Also
+checks the colored output is identical to the Pygments output.
+
+Usage:  python3 -m tests.benchmarks.bench_color [RECORDS]
+"""
+
+import sys
+import timeit
+from jello.lib import opts, Json
+from tests.benchmarks.bench_pretty import make_data
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = make_data(records)
+    json_out = Json()
+    json_out.set_colors()
+
+    for name, lines in (('pretty', False), ('-l', True)):
+        opts.lines = lines
+        cases = (
+            ('uncolored', lambda: json_out.create_json(data)),
+            ('color_json()', lambda: json_out.create_json(data, color=True)),
+            ('pygments', lambda: json_out.color_output(json_out.create_json(data))),
+        )
+
+        print(f'{records} records, {name}')
+        for case, func in cases:
+            best = min(timeit.repeat(func, number=1, repeat=3 if case != 'pygments' else 1))
+            print(f'    {case:<22} {best:8.3f}s')
+
+        identical = json_out.create_json(data, color=True) == json_out.color_output(json_out.create_json(data))
+        print(f'    identical output: {identical}')
+
+
+if __name__ == '__main__':
+    main()
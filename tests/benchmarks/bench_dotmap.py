@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Measures the memory and time it takes to convert a document made of many small
+objects to DotMap, with the current class and the DotMap of jello 1.6.1 (see
+dotmap_baseline.py) side by side. Every node is accessed, so every nested dict is
+converted. Reports the traced memory per DotMap node, on top of the plain decoded data.
+
+Usage:  python3 -m tests.benchmarks.bench_dotmap [RECORDS]
+"""
+
+import sys
+import time
+import tracemalloc
+from jello.dotmap import DotMap
+from tests.benchmarks.dotmap_baseline import DotMap as BaselineDotMap
+
+
+def make_data(records):
+    return [{'id': i, 'name': f'user {i}', 'geo': {'lat': 1.5, 'lon': -2.5},
+             'tags': [{'k': 'a'}, {'k': 'b'}]}
+            for i in range(records)]
+
+
+def touch(node, cls):
+    """access every value so all nested dicts are converted; returns the number of DotMaps"""
+    count = 1
+    for v in node.values():
+        if isinstance(v, cls):
+            count += touch(v, cls)
+        elif isinstance(v, list):
+            count += sum(touch(i, cls) for i in v if isinstance(i, cls))
+    return count
+
+
+def convert(data, cls):
+    wrapped = [cls(i, _dynamic=False, _prevent_method_masking=True) for i in data]
+    nodes = sum(touch(i, cls) for i in wrapped)
+    return wrapped, nodes
+
+
+def measure(data, cls):
+    """Returns the time, traced memory and number of nodes of converting data to cls"""
+    # time a run without tracing (tracemalloc slows allocations), then trace a second run
+    start = time.perf_counter()
+    convert(data, cls)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    wrapped, nodes = convert(data, cls)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, used, nodes
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = make_data(records)
+
+    results = {name: measure(data, cls) for name, cls in (('baseline', BaselineDotMap), ('current', DotMap))}
+
+    print(f'{records} records, {results["current"][2]} DotMap nodes')
+    for name, (elapsed, used, nodes) in results.items():
+        print(f'    {name:<10} {elapsed:8.3f}s   {used / 1024 / 1024:8.1f} MiB   {used / nodes:6.0f} bytes/node')
+
+    (base_elapsed, base_used, _), (elapsed, used, _) = results.values()
+    print(f'    {"change":<10} {elapsed / base_elapsed - 1:>+8.1%}    {used / base_used - 1:>+8.1%}')
+
+
+if __name__ == '__main__':
+    main()
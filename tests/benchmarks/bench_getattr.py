@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Times DotMap attribute access (_.foo), which goes through __getattr__, against
+bracket access (_['foo']) and a plain dict lookup, in a comprehension over many
+records like a typical query. Each access is timed with the current DotMap and
+with the DotMap of jello 1.6.1 (see dotmap_baseline.py) side by side.
+
+Usage:  python3 -m tests.benchmarks.bench_getattr [RECORDS]
+"""
+
+import sys
+import timeit
+from jello.dotmap import DotMap
+from tests.benchmarks.dotmap_baseline import DotMap as BaselineDotMap
+
+
+def best_time(func):
+    return min(timeit.repeat(func, number=1, repeat=3))
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = [{'id': i, 'geo': {'lat': 1.5}} for i in range(records)]
+    wrapped = {cls: [cls(i, _dynamic=False, _prevent_method_masking=True) for i in data]
+               for cls in (BaselineDotMap, DotMap)}
+
+    cases = (
+        ('bracket      r["id"]', lambda rows: [r['id'] for r in rows]),
+        ('attribute    r.id', lambda rows: [r.id for r in rows]),
+        ('nested       r.geo.lat', lambda rows: [r.geo.lat for r in rows]),
+    )
+
+    plain = best_time(lambda: [r['id'] for r in data])
+
+    print(f'{records} records (ns/access)')
+    print(f'    {"":<24}{"1.6.1":>10}{"current":>10}{"change":>9}')
+    name = 'plain dict   r["id"]'
+    print(f'    {name:<24}{"":>10}{plain / records * 1e9:>10.0f}')
+    for name, func in cases:
+        before, after = (best_time(lambda rows=wrapped[cls]: func(rows)) for cls in (BaselineDotMap, DotMap))
+        print(f'    {name:<24}{before / records * 1e9:>10.0f}{after / records * 1e9:>10.0f}{after / before - 1:>+9.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compares reading input as text (the previous STDIN path) with reading it as bytes
+in large chunks. Reports the wall time and the peak traced memory of reading and
+loading JSON Lines and JSON documents.
+
+Usage:  python3 -m tests.benchmarks.bench_ingest [RECORDS]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+from jello.lib import load_json, read_stream
+
+
+def make_corpus(path, records, jsonl=True):
+    """write a corpus with some non-ASCII text, which makes decoded str objects larger"""
+    rows = ({'id': i, 'name': f'user {i}', 'note': 'café \U0001F600 ' * 4, 'tags': ['a', 'b', 'c']}
+            for i in range(records))
+
+    with open(path, 'w', encoding='utf-8') as f:
+        if jsonl:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            json.dump(list(rows), f, ensure_ascii=False)
+
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return load_json(f.read())
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return load_json(read_stream(f))
+
+
+def measure(func, path):
+    """time a run without tracing (tracemalloc slows allocations), then trace a second run"""
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for jsonl in (True, False):
+            path = os.path.join(tmp, 'corpus')
+            make_corpus(path, records, jsonl=jsonl)
+            size = os.path.getsize(path) / 1024 / 1024
+            kind = 'JSON Lines' if jsonl else 'JSON'
+            print(f'{kind}: {records} records, {size:.1f} MiB')
+
+            for name, func in (('text', read_text), ('bytes', read_bytes)):
+                elapsed, peak = measure(func, path)
+                print(f'    {name:<6} {elapsed:8.3f}s   peak {peak / 1024 / 1024:8.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
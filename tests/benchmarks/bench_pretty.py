@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Compares the default (pretty) JSON output of pretty_json() with json.dumps(indent=2),
+which uses the pure-Python encoder, and with compact output from the C encoder.
+Also checks the pretty output is identical.
+
+Usage:  python3 -m tests.benchmarks.bench_pretty [RECORDS]
+"""
+
+import sys
+import json
+import timeit
+from jello.lib import pretty_json
+
+
+def make_data(records):
+    return [{'id': i, 'name': f'user {i}', 'email': f'u{i}@example.com', 'active': i % 2 == 0,
+             'score': i * 1.5, 'note': None, 'created': '2024-01-01T00:00:00Z',
+             'address': {'street': 'Main St', 'number': i, 'geo': {'lat': 52.5, 'lon': 13.4}},
+             'tags': ['a', 'b', 'c'], 'extra': {}}
+            for i in range(records)]
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    data = make_data(records)
+
+    cases = (
+        ('json.dumps(indent=2)', lambda: json.dumps(data, indent=2, ensure_ascii=False)),
+        ('pretty_json()', lambda: pretty_json(data)),
+        ('compact (-c)', lambda: json.dumps(data, separators=(',', ':'), ensure_ascii=False)),
+    )
+
+    print(f'{records} records')
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=3))
+        print(f'    {name:<22} {best:8.3f}s')
+
+    identical = pretty_json(data) == json.dumps(data, indent=2, ensure_ascii=False)
+    print(f'    identical output: {identical}')
+
+
+if __name__ == '__main__':
+    main()
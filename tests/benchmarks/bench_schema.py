@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Times the -s schema (with and without -t type annotations) of JSON Lines records
+with many keys, some of which are not valid variable names and need brackets.
+
+Usage:  python3 -m tests.benchmarks.bench_schema [RECORDS]
+"""
+
+import sys
+import json
+import timeit
+from jello.lib import opts, Schema, load_json
+
+FIELDS = 50
+
+
+def make_jsonl(records):
+    keys = [f'field_{n}' if n % 5 else f'field-{n}' for n in range(FIELDS)]
+    values = ['text', -12, 3.5, None, True]
+    return '\n'.join(json.dumps(dict({k: values[n % len(values)] for n, k in enumerate(keys)}, id=i))
+                     for i in range(records))
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    data = load_json(make_jsonl(records), 'jsonl')
+    schema = Schema()
+
+    print(f'{records} records, {FIELDS} fields')
+    for name, types in (('-s', False), ('-st', True)):
+        opts.types = types
+        best = min(timeit.repeat(lambda: schema.create_schema(data), number=1, repeat=3))
+        print(f'    {name:<6} {best:8.3f}s   {best / (records * FIELDS) * 1e9:6.0f} ns/value')
+
+
+if __name__ == '__main__':
+    main()
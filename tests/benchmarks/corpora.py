@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Generates the synthetic corpora of the benchmark suite. All of them are made from
+the same records, so their sizes are comparable:
+
+    deep    a JSON array of documents, each nested DEPTH objects deep
+    wide    a single JSON object with one key per record
+    jsonl   JSON Lines, one record per line
+    array   a JSON array of records
+
+The corpora are deterministic, so results can be compared across commits.
+
+Usage:  python3 -m tests.benchmarks.corpora DIRECTORY [RECORDS] [DEPTH]
+"""
+
+import os
+import sys
+import json
+
+CORPORA = ('deep', 'wide', 'jsonl', 'array')
+
+RECORDS = 20000
+DEPTH = 100
+
+
+def make_record(i):
+    return {'id': i, 'name': f'user {i}', 'email': f'u{i}@example.com', 'active': i % 3 != 0,
+            'score': i % 100 + 0.5, 'note': None if i % 2 else 'café \U0001F600',
+            'tags': ['a', 'b', 'c'][:i % 4],
+            'user': {'name': f'User {i}', 'roles': ['admin', 'dev'][:i % 3], 'geo': {'lat': 52.5, 'lon': 13.4}}}
+
+
+def make_deep(records, depth=DEPTH):
+    """Returns documents that nest depth objects, with about one record of data per object"""
+    documents = []
+    for start in range(0, records, depth):
+        document = {}
+        for i in range(min(start + depth, records) - 1, start - 1, -1):
+            document = {'level': i - start, 'record': make_record(i), 'child': document}
+        documents.append(document)
+    return documents
+
+
+def make_corpus(name, records=RECORDS, depth=DEPTH):
+    """Returns the text of a corpus"""
+    if name == 'deep':
+        return json.dumps(make_deep(records, depth), ensure_ascii=False)
+
+    if name == 'wide':
+        return json.dumps({f'key-{i}' if i % 5 == 0 else f'key_{i}': make_record(i) for i in range(records)},
+                          ensure_ascii=False)
+
+    if name == 'jsonl':
+        return '\n'.join(json.dumps(make_record(i), ensure_ascii=False) for i in range(records)) + '\n'
+
+    if name == 'array':
+        return json.dumps([make_record(i) for i in range(records)], ensure_ascii=False)
+
+    raise ValueError(f'Unknown corpus: {name}. Use one of: {", ".join(CORPORA)}')
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__, file=sys.stderr)
+        sys.exit(1)
+
+    directory = sys.argv[1]
+    records = int(sys.argv[2]) if len(sys.argv) > 2 else RECORDS
+    depth = int(sys.argv[3]) if len(sys.argv) > 3 else DEPTH
+
+    os.makedirs(directory, exist_ok=True)
+    for name in CORPORA:
+        path = os.path.join(directory, f'{name}.json{"l" if name == "jsonl" else ""}')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(make_corpus(name, records, depth))
+        print(f'{path}: {os.path.getsize(path)} bytes')
+
+
+if __name__ == '__main__':
+    main()
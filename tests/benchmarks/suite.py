@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Runs the benchmark suite against the synthetic corpora (see corpora.py): load_json(),
+DotMap wrapping, common query shapes, create_json() (pretty, compact and lines) and
+Schema.create_schema(). Prints the best and mean time of each benchmark and saves
+the results as JSON, so runs can be compared across commits with --compare.
+
+Usage:  python3 -m tests.benchmarks.suite [--records N] [--depth N] [--repeat N]
+                                          [--filter TEXT] [--output FILE] [--compare FILE]
+"""
+
+import sys
+import json
+import time
+import timeit
+import platform
+import argparse
+import subprocess
+from jello.lib import opts, load_json, Query, Json, Schema, _wrap_data
+from tests.benchmarks.corpora import CORPORA, RECORDS, DEPTH, make_corpus
+
+QUERIES = (
+    ('identity', 'array', '_'),
+    ('attribute', 'array', '[r.user.name for r in _]'),
+    ('filter', 'array', '[r for r in _ if r.score > 50]'),
+    ('projection', 'array', '[{"id": r.id, "name": r.name, "roles": r.user.roles} for r in _]'),
+    ('aggregate', 'array', 'sum(r.score for r in _)'),
+    ('path', 'deep', '[d.child.child.child.record.user.name for d in _]'),
+    ('values', 'wide', '[v.email for v in _.values()]'),
+)
+
+# corpora and the options of each output mode of create_json()
+OUTPUTS = (
+    ('pretty', ('array', 'deep', 'wide'), {}),
+    ('compact', ('array',), {'compact': True}),
+    ('lines', ('array',), {'lines': True}),
+)
+
+SCHEMAS = ('array', 'deep', 'wide')
+
+
+def git_commit():
+    """Returns the current commit, or None outside of a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def json_output(data, options):
+    for k, v in options.items():
+        setattr(opts, k, v)
+    try:
+        return Json().create_json(data)
+    finally:
+        for k in options:
+            setattr(opts, k, None)
+
+
+def iter_benchmarks(texts, loaded):
+    """yield the name and function of each benchmark"""
+    for name in CORPORA:
+        yield f'load_json/{name}', lambda text=texts[name]: load_json(text)
+
+    for name in CORPORA:
+        yield f'wrap/{name}', lambda data=loaded[name]: _wrap_data(data)
+
+    for name, corpus, query in QUERIES:
+        yield f'query/{name}', lambda data=loaded[corpus], query=query: Query(query).run(data)
+
+    for mode, corpora, options in OUTPUTS:
+        for corpus in corpora:
+            yield f'create_json/{mode}/{corpus}', lambda data=loaded[corpus], options=options: json_output(data, options)
+
+    for corpus in SCHEMAS:
+        yield f'create_schema/{corpus}', lambda data=loaded[corpus]: Schema().create_schema(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the jello benchmark suite.')
+    parser.add_argument('--records', type=int, default=RECORDS, help=f'records in each corpus (default: {RECORDS})')
+    parser.add_argument('--depth', type=int, default=DEPTH, help=f'nesting of the deep corpus (default: {DEPTH})')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark (default: 3)')
+    parser.add_argument('--filter', default='', help='only run the benchmarks whose name contains TEXT')
+    parser.add_argument('--output', help='save the results as JSON to FILE')
+    parser.add_argument('--compare', help='compare with the results saved in FILE')
+    args = parser.parse_args()
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)['results']
+
+    texts = {name: make_corpus(name, args.records, args.depth).encode('utf-8') for name in CORPORA}
+    loaded = {name: load_json(text) for name, text in texts.items()}
+
+    results = {}
+    print(f'{args.records} records, depth {args.depth}, best of {args.repeat}')
+    print(f'    {"benchmark":<32}{"best (s)":>10}{"mean (s)":>10}' + (f'{"was (s)":>10}{"change":>9}' if previous else ''))
+
+    for name, func in iter_benchmarks(texts, loaded):
+        if args.filter not in name:
+            continue
+
+        times = timeit.repeat(func, number=1, repeat=args.repeat)
+        results[name] = {'best': min(times), 'mean': sum(times) / len(times)}
+
+        line = f'    {name:<32}{results[name]["best"]:>10.4f}{results[name]["mean"]:>10.4f}'
+        if name in previous:
+            was = previous[name]['best']
+            line += f'{was:>10.4f}{(results[name]["best"] - was) / was:>+9.1%}'
+        print(line)
+
+    if args.output:
+        report = {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'records': args.records,
+            'depth': args.depth,
+            'repeat': args.repeat,
+            'corpora': {name: len(text) for name, text in texts.items()},
+            'results': results
+        }
+
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'results saved to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
+import json
 import unittest
 from collections import OrderedDict
 import pygments
-from jello.lib import opts, Json
+from jello.lib import opts, Json, pretty_json
 
 
 class MyTests(unittest.TestCase):
@@ -460,6 +461,26 @@ class MyTests(unittest.TestCase):
         expected = '{\n  \x1b[34;01m"string"\x1b[39;00m: \x1b[32m"string\\nwith newline\\ncharacters in it"\x1b[39m,\n  \x1b[34;01m"true"\x1b[39;00m: \x1b[90mtrue\x1b[39m,\n  \x1b[34;01m"false"\x1b[39;00m: \x1b[90mfalse\x1b[39m,\n  \x1b[34;01m"null"\x1b[39;00m: \x1b[90mnull\x1b[39m,\n  \x1b[34;01m"int"\x1b[39;00m: \x1b[35m42\x1b[39m,\n  \x1b[34;01m"float"\x1b[39;00m: \x1b[35m3.14\x1b[39m,\n  \x1b[34;01m"array"\x1b[39;00m: [\n    \x1b[32m"string\\nwith newline\\ncharacters in it"\x1b[39m,\n    \x1b[90mtrue\x1b[39m,\n    \x1b[90mfalse\x1b[39m,\n    \x1b[90mnull\x1b[39m,\n    \x1b[35m42\x1b[39m,\n    \x1b[35m3.14\x1b[39m\n  ]\n}'
         output = self.json_out.create_json(data_in)
         self.assertEqual(self.json_out.color_output(output), expected)
+        self.assertEqual(self.json_out.create_json(data_in, color=True), expected)
+
+    def test_color_json_matches_pygments(self):
+        """
+        Test color output without Pygments is the same as coloring with Pygments
+        """
+        data_in = [self.dict_sample, {'nested': [[], {}, {'a': -1.5e-07}], 'escapes': 'a\\b"c\\', '"key"': '{[1]}'}]
+        for compact in (False, True):
+            opts.compact = compact
+            output = self.json_out.create_json(data_in)
+            self.assertEqual(self.json_out.create_json(data_in, color=True), self.json_out.color_output(output))
+
+    def test_color_l_unescaped_string(self):
+        """
+        Test -l color output of a string with quotes, which are not escaped in -l output
+        """
+        data_in = ['say "hi"', {'a': 1}]
+        expected = '\x1b[32m"say "hi""\x1b[39m\n{\x1b[34;01m"a"\x1b[39;00m:\x1b[35m1\x1b[39m}'
+        opts.lines = True
+        self.assertEqual(self.json_out.create_json(data_in, color=True), expected)
 
     #
     # true in a list
@@ -1245,6 +1266,73 @@ class MyTests(unittest.TestCase):
         opts.lines = True
         self.assertEqual(self.json_out.create_json(data_in), expected)
 
+    def test_pretty_json_matches_indent(self):
+        """
+        Test pretty_json() output is identical to json.dumps(indent=2) for tricky strings
+        """
+        for data_in in (self.dict_sample, self.list_of_dicts_sample, self.list_of_lists_sample,
+                        {'': {}, 'a': [], 'b': [[], {}, [{}]], 'c': {'d': None}},
+                        {'{key}': '[not] a {bracket}', 'quote': 'say \\"hi\\"', 'slash': 'C:\\\\', 'é': '[]'},
+                        ['\\', '\\"', '\\\\"', '"[', ']"', 'tab\t[', '\U0001F600']):
+            self.assertEqual(pretty_json(data_in), json.dumps(data_in, indent=2, ensure_ascii=False))
+
+    def test_iter_json_batches(self):
+        """
+        Test large lists and dicts are yielded in batches with the same output
+        """
+        for compact in (None, True):
+            opts.compact = compact
+            for data_in in ([{'a': i, 'b': [i, {}]} for i in range(2500)], {str(i): [i] for i in range(2001)}):
+                chunks = list(self.json_out.iter_json(data_in))
+                self.assertGreater(len(chunks), 3)
+                if compact:
+                    expected = json.dumps(data_in, separators=(',', ':'), ensure_ascii=False)
+                else:
+                    expected = json.dumps(data_in, indent=2, ensure_ascii=False)
+                self.assertEqual(''.join(chunks), expected)
+
+    def test_iter_json_nested_batches(self):
+        """
+        Test large lists and dicts nested in small containers are yielded in batches with the same output
+        """
+        for compact in (None, True):
+            opts.compact = compact
+            for data_in in ({'meta': {'count': 2500}, 'data': [{'a': i, 'b': [i, {}]} for i in range(2500)]},
+                            [{'data': {'items': {str(i): [i, 'é\n'] for i in range(4001)}}, 1: None}, [], 3],
+                            {'a': [list(range(3500)), {'b': list(range(2500))}], 'c': {}}):
+                chunks = list(self.json_out.iter_json(data_in))
+                if compact:
+                    expected = json.dumps(data_in, separators=(',', ':'), ensure_ascii=False)
+                else:
+                    expected = json.dumps(data_in, indent=2, ensure_ascii=False)
+                self.assertEqual(''.join(chunks), expected)
+                self.assertGreater(len(chunks), 3)
+                self.assertLess(max(map(len, chunks)), len(expected) / 2)
+
+    def test_iter_lines_batches(self):
+        """
+        Test -l output of a large list is yielded in batches and trailing whitespace is stripped
+        """
+        data_in = [None, 'a ', None] * 1000 + [' ', None, '']
+        opts.lines = True
+        opts.raw = True
+        chunks = list(self.json_out.iter_json(data_in))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), '\na \n\n' * 999 + '\na')
+
+    def test_iter_json_iterator_chunks(self):
+        """
+        Test iterator output starts with a single line and the chunks grow from there
+        """
+        opts.lines = None
+        chunks = list(self.json_out.iter_json(iter(range(10))))
+        self.assertEqual(chunks, ['0', '\n1\n2', '\n3\n4\n5\n6', '\n7\n8\n9'])
+
+        opts.lines = True
+        chunks = list(self.json_out.iter_json(iter(range(4))))
+        self.assertEqual(chunks[0], '0')
+        self.assertEqual(''.join(chunks), '0\n1\n2\n3')
+
     def test_non_serializable(self):
         """
         Test _.items()
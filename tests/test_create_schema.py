@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
+import sys
 import unittest
 import os
-from jello.lib import opts, Schema
+from jello.lib import opts, Schema, SchemaSummary, OUTPUT_BATCH
 
 
 class MyTests(unittest.TestCase):
@@ -557,5 +558,96 @@ class MyTests(unittest.TestCase):
         output = self.schema.create_schema(data_in)
         self.assertEqual(output, expected)
 
+    def test_number_types_mt(self):
+        """
+        Test negative numbers, exponents and strings of digits -mt
+        """
+        opts.types = True
+        data_in = {'neg': -1, 'exp': 1e+30, 'digits': '42'}
+        expected = '_ = {};                                                             //  (object)\n_.neg = -1;                                                         //  (number)\n_.exp = 1e+30;                                                      //  (number)\n_.digits = "42";                                                    //  (string)'
+        self.assertEqual(self.schema.create_schema(data_in), expected)
+
+    #
+    # Deep and large documents
+    #
+
+    def test_deeper_than_recursion_limit(self):
+        """
+        Test a document nested deeper than the recursion limit
+        """
+        depth = sys.getrecursionlimit() + 100
+        data_in = 1
+        for _ in range(depth):
+            data_in = [data_in]
+
+        lines = self.schema.create_schema(data_in).split('\n')
+        self.assertEqual(len(lines), depth + 1)
+        self.assertEqual(lines[-1], '_' + '[0]' * depth + ' = 1;')
+
+    def test_iter_schema_chunks(self):
+        """
+        Test the schema is yielded in chunks of lines, including the elements of an iterator
+        """
+        last = OUTPUT_BATCH - 1
+        data_in = iter(range(OUTPUT_BATCH))
+        chunks = list(self.schema.iter_schema(data_in))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[0].count('\n'), OUTPUT_BATCH - 1)
+        self.assertEqual(chunks[1], f'\n_[{last}] = {last};')
+        self.assertEqual(''.join(chunks), self.schema.create_schema(list(range(OUTPUT_BATCH))))
+
+    #
+    # Schema summary
+    #
+
+    def test_summary(self):
+        """
+        Test the schema summary of a list of records
+        """
+        data_in = [{'id': 1, 'tags': ['a'], 'geo': None}, {'id': 'x', 'tags': [], 'geo': {'lat': 1.5}}]
+        expected = '_;                                                              // array: 1\n_[*];                                                           // object: 2\n_[*].id;                                                        // number: 1, string: 1\n_[*].tags;                                                      // array: 2\n_[*].tags[*];                                                   // string: 1\n_[*].geo;                                                       // null: 1, object: 1\n_[*].geo.lat;                                                   // number: 1'
+        summary = SchemaSummary()
+        summary.add(data_in)
+        self.assertEqual(summary.create_summary(), expected)
+
+    def test_summary_iterator_and_merge(self):
+        """
+        Test an iterator and merged summaries of parts of a list summarize the same as the list
+        """
+        data_in = [{'a': i, 'b': [{'c': str(i)}] * i, 'd e': True} for i in range(10)]
+        summary = SchemaSummary()
+        summary.add(data_in)
+        expected = summary.create_summary()
+
+        summary = SchemaSummary()
+        summary.add(iter(data_in))
+        self.assertEqual(summary.create_summary(), expected)
+
+        summary = SchemaSummary()
+        summary.add_items(())
+        for part in (data_in[:3], data_in[3:]):
+            part_summary = SchemaSummary()
+            for item in part:
+                part_summary.add_item(item)
+            summary.merge(part_summary)
+        self.assertEqual(summary.create_summary(), expected)
+
+    def test_summary_deeper_than_recursion_limit(self):
+        """
+        Test the summary of a document nested deeper than the recursion limit
+        """
+        depth = sys.getrecursionlimit() + 100
+        data_in = 1
+        for _ in range(depth):
+            data_in = [data_in]
+
+        summary = SchemaSummary()
+        summary.add(data_in)
+        lines = summary.create_summary().split('\n')
+        self.assertEqual(len(lines), depth + 1)
+        self.assertTrue(lines[-1].startswith('_' + '[*]' * depth + ';'))
+        self.assertTrue(lines[-1].endswith('// number: 1'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import copy
+import pickle
+import unittest
+from jello.dotmap import DotMap, reserved_keys
+
+
+class MyTests(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'meta': {'count': 2, 'source': {'name': 'test'}},
+            'records': [
+                {'id': 1, 'tags': ['a', 'b']},
+                {'id': 2, 'tags': []},
+                'not a dict'
+            ]
+        }
+
+    def test_lazy_nested_dict(self):
+        """
+        Test nested dicts are only converted to DotMap when accessed
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertIs(type(d._map['meta']), dict)
+        self.assertEqual(d.meta.source.name, 'test')
+        self.assertIsInstance(d._map['meta'], DotMap)
+        self.assertIs(d.meta, d['meta'])
+
+    def test_lazy_list_of_dicts(self):
+        """
+        Test the dicts in a list are converted to DotMap when the list is accessed
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual([i.id for i in d.records[:2]], [1, 2])
+        self.assertEqual(d.records[2], 'not a dict')
+        self.assertIs(d.records, d.records)
+
+    def test_lazy_values_and_get(self):
+        """
+        Test values(), items() and get() return converted values
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual(d.get('meta').count, 2)
+        self.assertEqual(list(d.values())[0].source.name, 'test')
+        self.assertEqual([k for k, v in d.items() if isinstance(v, DotMap)], ['meta'])
+        self.assertEqual(d.get('missing', 'default'), 'default')
+
+    def test_toDict_untouched_subtree(self):
+        """
+        Test toDict() passes subtrees that were never accessed straight through
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        d.records[0].id = 100
+        result = d.toDict()
+        self.assertEqual(result['records'][0], {'id': 100, 'tags': ['a', 'b']})
+        self.assertIs(result['meta'], self.data['meta'])
+
+    def test_toDict_unmodified_returns_source(self):
+        """
+        Test toDict() returns the source dict when nothing was modified
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual(d.meta.source.name, 'test')
+        self.assertEqual(d.records[0].tags, ['a', 'b'])
+        self.assertIs(d.toDict(), self.data)
+        self.assertIs(d.meta.toDict(), self.data['meta'])
+
+    def test_toDict_modified_copies_path(self):
+        """
+        Test toDict() only copies the dicts and lists that lead to a modification
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        d.meta.source.name = 'changed'
+        d.records.append('new')
+        result = d.toDict()
+        self.assertIsNot(result, self.data)
+        self.assertEqual(result['meta'], {'count': 2, 'source': {'name': 'changed'}})
+        self.assertEqual(self.data['meta']['source']['name'], 'test')
+        self.assertEqual(len(result['records']), 4)
+        self.assertIs(result['records'][0], self.data['records'][0])
+
+    def test_toDict_shared_value(self):
+        """
+        Test a DotMap assigned to more than one key is converted for each of them
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        d.first = d.meta.source
+        d.second = d.meta.source
+        result = d.toDict()
+        self.assertEqual(result['first'], {'name': 'test'})
+        self.assertEqual(result['second'], {'name': 'test'})
+
+    def test_assign_list_of_dicts(self):
+        """
+        Test a list assigned after the first access is converted again
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual(d.records[0].id, 1)
+        d.records = [{'id': 3}]
+        self.assertEqual(d.records[0].id, 3)
+        d.update({'records': [{'id': 4}]})
+        self.assertEqual(d.records[0].id, 4)
+
+    def test_attribute_lookup(self):
+        """
+        Test attribute access returns keys, methods and raises for reserved names
+        """
+        d = DotMap({'id': 1, '__dunder__': 2, 'toDict': 3, '_map': 4}, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual(d.id, 1)
+        self.assertTrue(callable(d.toDict))
+        self.assertEqual(d['toDict'], 3)
+        self.assertIs(type(d._map), dict)
+        self.assertRaises(AttributeError, getattr, d, '__dunder__')
+        self.assertRaises(KeyError, getattr, d, 'missing')
+        self.assertEqual(DotMap().missing.nested, DotMap())
+
+    def test_attribute_lookup_internal_names(self):
+        """
+        Test keys named like the internal state of the lazy conversion are returned
+        """
+        data = {'_source': {'a': 1}, '_dirty': 5, '_converted': [{'b': 2}], '_wrapped_lists': None}
+        d = DotMap(data, _dynamic=False, _prevent_method_masking=True)
+        self.assertEqual(d._source.a, 1)
+        self.assertEqual(d._dirty, 5)
+        self.assertEqual(d._converted[0].b, 2)
+        self.assertIsNone(d._wrapped_lists)
+        self.assertIs(d.toDict(), data)
+
+    def test_slots(self):
+        """
+        Test DotMap has no instance __dict__ and is still a dict
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        self.assertFalse(hasattr(d, '__dict__'))
+        self.assertIsInstance(d, dict)
+        self.assertNotIn('_map', reserved_keys)
+        self.assertIn('toDict', reserved_keys)
+
+    def test_pickle_and_copy(self):
+        """
+        Test DotMap survives pickling, copy() and deepcopy()
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        d.meta.count = 3
+        for new in (pickle.loads(pickle.dumps(d)), copy.copy(d), copy.deepcopy(d)):
+            self.assertEqual(new.meta.count, 3)
+            self.assertEqual(new.toDict()['records'][0], {'id': 1, 'tags': ['a', 'b']})
+
+    def test_copy_independent(self):
+        """
+        Test changing the nested maps of a copy does not change the original, accessed or not
+        """
+        d = DotMap(self.data, _dynamic=False, _prevent_method_masking=True)
+        _ = d.meta.count
+        new = d.copy()
+        new.meta.count = 3
+        new.meta.source.name = 'copy'
+        new.records[0].id = 5
+        self.assertEqual(d.meta.count, 2)
+        self.assertEqual(d.meta.source.name, 'test')
+        self.assertEqual(d.records[0].id, 1)
+        self.assertIs(d.toDict(), self.data)
+        self.assertEqual(self.data['meta'], {'count': 2, 'source': {'name': 'test'}})
+
+    def test_str_nested(self):
+        """
+        Test nested dicts print as DotMaps, whether or not they were accessed
+        """
+        d = DotMap({'a': {'b': 1}, 'c': [{'d': 2}, 3]})
+        self.assertEqual(str(d), "DotMap(a=DotMap(b=1), c=[DotMap(d=2), 3])")
+        self.assertEqual(repr(d), str(d))
+
+
+if __name__ == '__main__':
+    unittest.main()
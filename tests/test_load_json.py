@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 
+import os
+import json
+import tempfile
 import unittest
-from jello.lib import load_json
+from jello.lib import load_json, detect_format, iter_json_array, map_file
 
 
 class MyTests(unittest.TestCase):
@@ -57,6 +60,105 @@ class MyTests(unittest.TestCase):
         expected = [{'foo': 1, 'bar': 2, 'baz': 3}, {'foo': 4, 'bar': 5, 'baz': 6}, {'foo': 7, 'bar': 8, 'baz': 9}]
         self.assertEqual(load_json(self.json_lines_extra_spaces), expected)
 
+    def test_load_bytes_json_lines(self):
+        """
+        Test with JSON Lines as bytes
+        """
+        expected = [{'foo': 1, 'bar': 2, 'baz': 3}, {'foo': 4, 'bar': 5, 'baz': 6}, {'foo': 7, 'bar': 8, 'baz': 9}]
+        self.assertEqual(load_json(self.json_lines_extra_spaces.encode()), expected)
+
+    def test_load_mapped_files(self):
+        """
+        Test with memory-mapped JSON and JSON Lines files
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            for content in [self.pretty_json, self.json_lines]:
+                file_path = os.path.join(tmp, 'data.json')
+                with open(file_path, 'w') as f:
+                    f.write(content)
+
+                mapped = map_file(file_path)
+                self.assertEqual(load_json(mapped), load_json(content))
+                mapped.close()
+
+    def test_detect_format(self):
+        """
+        Test input format detection
+        """
+        self.assertEqual(detect_format(self.pretty_json), 'json')
+        self.assertEqual(detect_format(self.compact_json + '\n\n'), 'json')
+        self.assertEqual(detect_format(self.json_lines), 'jsonl')
+        self.assertEqual(detect_format(self.json_lines_extra_spaces.encode()), 'jsonl')
+        self.assertEqual(detect_format('[1, 2]\r\n[3, 4]\r\n'), 'jsonl')
+        self.assertEqual(detect_format('[1,\n2]'), 'json')
+        self.assertEqual(detect_format(''), 'jsonl')
+        self.assertEqual(detect_format(b' \n\t'), 'jsonl')
+
+    def test_load_blank_input(self):
+        """
+        Test empty and whitespace-only input loads as an empty list
+        """
+        self.assertEqual(load_json(''), [])
+        self.assertEqual(load_json('  \n\n'), [])
+        self.assertEqual(load_json(b''), [])
+
+    def test_load_explicit_format(self):
+        """
+        Test with the input format set explicitly
+        """
+        self.assertEqual(load_json('[1, 2]\n', input_format='jsonl'), [[1, 2]])
+        self.assertEqual(load_json(self.json_lines, input_format='jsonl'), load_json(self.json_lines))
+        self.assertRaises(ValueError, load_json, self.json_lines, input_format='json')
+        self.assertRaises(ValueError, load_json, self.json_lines, input_format='yaml')
+
+    def test_iter_json_array(self):
+        """
+        Test incremental loading of a JSON array split into small chunks
+        """
+        data = '[{"foo": 1, "bar": "],}"}, 1.5e10, -123456, true, null, "caf\u00e9 \U0001F600"]'.encode()
+        expected = [{'foo': 1, 'bar': '],}'}, 1.5e10, -123456, True, None, 'caf\u00e9 \U0001F600']
+        for size in (1, 2, 7, 100):
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    def test_iter_json_array_path(self):
+        """
+        Test incremental loading of an array nested in the document
+        """
+        data = '{"meta": {"skip": [1, {"items": 0}]}, "data": {"items": [[0], [1, 2]]}, "after": 1}'
+        chunks = [data[i:i + 5] for i in range(0, len(data), 5)]
+        self.assertEqual(list(iter_json_array(chunks, ['data', 'items'])), [[0], [1, 2]])
+        self.assertEqual(list(iter_json_array(chunks, ['data', 'items', '1'])), [1, 2])
+        self.assertRaises(KeyError, list, iter_json_array(chunks, ['data', 'missing']))
+        self.assertRaises(TypeError, list, iter_json_array(chunks, ['after']))
+
+    def test_iter_json_array_not_array(self):
+        """
+        Test incremental loading of top-level values that are not arrays
+        """
+        self.assertEqual(list(iter_json_array(['{"foo": 1}\n{"foo": 2}'])), [{'foo': 1}, {'foo': 2}])
+        self.assertEqual(list(iter_json_array(['[]'])), [])
+        self.assertRaises(ValueError, list, iter_json_array(['[1, 2] 3']))
+        self.assertRaises(ValueError, list, iter_json_array(['[1, 2']))
+
+
+    def test_iter_json_array_error_position(self):
+        """
+        Test decode errors report the position in the whole input, not in the current chunk
+        """
+        data = '[\n' + ',\n'.join(json.dumps({'foo': i, 'bar': 'x' * 50}) for i in range(500)) + ',\n  {"foo": tru}]'
+        for text, chunks in ((data, [data[i:i + 1000] for i in range(0, len(data), 1000)]),
+                             (data + ' 3', [data.encode(), b' 3']),
+                             ('[1,2', ['[1,', '2'])):
+            with self.assertRaises(json.JSONDecodeError) as expected:
+                json.loads(text)
+            with self.assertRaises(json.JSONDecodeError) as error:
+                list(iter_json_array(chunks))
+
+            e = error.exception
+            self.assertEqual((e.pos, e.lineno, e.colno), (expected.exception.pos, expected.exception.lineno,
+                                                          expected.exception.colno))
+            self.assertTrue(str(e).endswith(f'line {e.lineno} column {e.colno} (char {e.pos})'))
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,6 +5,12 @@ import sys
 import io
 import contextlib
 import copy
+import json
+import select
+import signal
+import subprocess
+import tempfile
+import time
 import unittest
 from unittest.mock import patch
 import jello.cli
@@ -25,11 +31,20 @@ class MyTests(unittest.TestCase):
         opts.nulls = None
         opts.empty = None
         opts.raw = None
+        opts.raw_input = None
         opts.lines = None
         opts.force_color = None
         opts.mono = None
         opts.schema = None
+        opts.schema_summary = None
         opts.types = None
+        opts.stream = None
+        opts.jobs = None
+        opts.input_format = None
+        opts.stream_path = None
+        opts.profile = None
+        opts.profile_stats = None
+        opts.metrics_file = None
         opts.keyname_color = None
         opts.keyword_color = None
         opts.number_color = None
@@ -3738,9 +3753,9 @@ foods = set(f.name for f in _.foods)
 
     def test_data_file(self):
 
-        # patch read_file function to mock initialization file
-        old_read_file = copy.copy(jello.cli.read_file)
-        jello.cli.read_file = lambda x: '''{"a": "hello world"}'''
+        # patch map_file function to mock data file
+        old_map_file = copy.copy(jello.cli.map_file)
+        jello.cli.map_file = lambda x: b'''{"a": "hello world"}'''
 
         sample = ''
         expected = '"hello world"\n'
@@ -3751,9 +3766,60 @@ foods = set(f.name for f in _.foods)
             with patch.object(sys, 'argv', testargs):
                 _ = jello.cli.main(data=sample)
 
-        jello.cli.read_file = old_read_file
+        jello.cli.map_file = old_map_file
+        self.assertEqual(f.getvalue(), expected)
+
+
+    def test_data_files_mapped(self):
+        expected = '[{"a":1},{"a":2},{"a":3}]\n'
+
+        with tempfile.TemporaryDirectory() as tmp:
+            data_files = []
+            for i, content in enumerate(['{"a": 1}\n{"a": 2}\n', '{"a": 3}']):
+                data_files.append(os.path.join(tmp, f'data{i}.jlines'))
+                with open(data_files[-1], 'w') as df:
+                    df.write(content)
+
+            f = io.StringIO()
+            with contextlib.redirect_stdout(f):
+                testargs = ['jello', '-c', '-f'] + data_files
+                with patch.object(sys, 'argv', testargs):
+                    _ = jello.cli.main()
+
+        self.assertEqual(f.getvalue(), expected)
+
+
+    def test_empty_input(self):
+        sample = ''
+        expected = '[]\n'
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
         self.assertEqual(f.getvalue(), expected)
 
+    @unittest.skipIf(sys.platform.startswith('win32'), 'STDIN newlines are translated on Windows')
+    def test_raw_input_newlines(self):
+        """
+        Test -R keeps the carriage returns of STDIN, while the newlines of data files are translated
+        """
+        sample = b'a\r\nb\rc\r\n'
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, 'data.txt')
+            with open(data_file, 'wb') as f:
+                f.write(sample)
+
+            for args, expected in ((['-R', 'repr(_)'], "\"'a\\r\\nb\\rc'\"\n"),
+                                   (['-R', 'repr(_)', '-f', data_file], "\"'a\\nb\\nc'\"\n")):
+                f = io.StringIO()
+                with contextlib.redirect_stdout(f):
+                    testargs = ['jello', *args]
+                    with patch.object(sys, 'argv', testargs), patch.object(jello.cli, 'get_stdin', return_value=sample):
+                        _ = jello.cli.main()
+
+                self.assertEqual(f.getvalue(), expected)
 
     def test_empty_data_option(self):
         sample = ''
@@ -3770,6 +3836,355 @@ foods = set(f.name for f in _.foods)
 
         self.assertEqual(f.getvalue(), expected)
 
+    def test_stream(self):
+        sample = '{"a": 1, "b": {"c": "x"}}\n\n{"a": 2, "b": {"c": "y"}}\n{"a": 3, "b": {"c": "z"}}\n'
+        expected = '{"a":1,"c":"x"}\n{"a":2,"c":"y"}\n{"a":3,"c":"z"}\n'
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello', '--stream', '{"a": _.a, "c": _.b.c}']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_stream_lines_skip_nulls(self):
+        sample = '{"a": 1}\n{"a": 2}\n{"a": 3}\n'
+        expected = '1\n3\n'
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello', '--stream', '-l', '_.a if _.a != 2 else None']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_stream_query_variables_do_not_leak(self):
+        sample = '{"a": 1}\n{"b": 2}\n'
+        expected = '1\nnull\n'
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello', '--stream', '-n', 'x = _.get("a")\nx']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_stream_json_array(self):
+        sample = '[\n  {"a": 1},\n  {"a": 2}\n]\n'
+        expected = '1\n2\n'
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello', '--stream', '_.a']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_stream_path(self):
+        sample = '{"meta": {"count": 2}, "data": {"items": [{"a": 1}, {"a": 2}]}}'
+        expected = '{"a":1}\n{"a":2}\n'
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f):
+            testargs = ['jello', '--stream-path=data.items']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_jobs(self):
+        sample = ''.join(f'{{"a": {i}}}\n' for i in range(1000))
+        expected = ''.join(f'{i * 2}\n' for i in range(1000))
+
+        f = io.StringIO()
+        with contextlib.redirect_stdout(f), patch.object(jello.cli, 'CHUNK_SIZE', 100):
+            testargs = ['jello', '--jobs=2', '_.a * 2']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=sample)
+
+        self.assertEqual(f.getvalue(), expected)
+
+    def test_jobs_error(self):
+        """
+        Test errors in the worker processes are printed like the errors of --stream
+        """
+        sample = '{"a": 1}\n{"a": 0}\n{"a": 2}\n'
+        query = 'x = 1\n1 / _.a'
+
+        results = []
+        for mode in ('--stream', '--jobs=2'):
+            opts.stream = opts.jobs = None
+            stdout = io.StringIO()
+            stderr = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                testargs = ['jello', mode, query]
+                with patch.object(sys, 'argv', testargs), self.assertRaises(SystemExit):
+                    _ = jello.cli.main(data=sample)
+
+            results.append((stdout.getvalue(), stderr.getvalue()))
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], '1.0\n')
+        self.assertIn('Jello query, line 2', results[1][1])
+
+    @unittest.skipIf(not os.path.isdir('/proc') or not hasattr(signal, 'SIGPIPE'), '/proc or SIGPIPE is not available')
+    def test_jobs_broken_pipe(self):
+        """
+        Test the worker processes are stopped when the reader of STDOUT goes away
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            data_file = os.path.join(tmp, 'data.jsonl')
+            with open(data_file, 'w') as f:
+                f.writelines(f'{{"a": {i}}}\n' for i in range(200000))
+
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(THIS_DIR))
+            with subprocess.Popen([sys.executable, '-m', 'jello', '--jobs=3', '_.a', '-f', data_file],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env) as proc:
+                self.assertEqual(proc.stdout.readline(), b'0\n')
+                proc.stdout.close()
+                self.assertEqual(proc.wait(timeout=30), 1)
+
+            # the workers are forked with the same command line as the main process
+            left = []
+            for pid in filter(str.isdigit, os.listdir('/proc')):
+                try:
+                    with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                        if data_file.encode() in f.read():
+                            left.append(pid)
+                except OSError:
+                    pass
+
+            self.assertEqual(left, [])
+
+    def test_schema_summary(self):
+        """
+        Test --schema-summary merges the records of JSON Lines input, also with --stream and --jobs
+        """
+        sample = ''.join(f'{{"a": {i}, "b": [{i}, "x"]}}\n' if i % 2 else '{"a": null}\n' for i in range(100))
+        expected = '\n'.join([
+            '_;                                                              // array: 1',
+            '_[*];                                                           // object: 100',
+            '_[*].a;                                                         // null: 50, number: 50',
+            '_[*].b;                                                         // array: 50',
+            '_[*].b[*];                                                      // number: 50, string: 50'
+        ]) + '\n'
+
+        for mode in ([], ['--stream'], ['--jobs=2']):
+            opts.stream = opts.jobs = opts.schema_summary = None
+            f = io.StringIO()
+            with contextlib.redirect_stdout(f), patch.object(jello.cli, 'CHUNK_SIZE', 100):
+                testargs = ['jello', *mode, '--schema-summary']
+                with patch.object(sys, 'argv', testargs):
+                    _ = jello.cli.main(data=sample)
+
+            self.assertEqual(f.getvalue(), expected, mode)
+
+    def test_generator_output(self):
+        """
+        Test a generator result is printed as JSON Lines, or lines with -l
+        """
+        sample = '[{"a": 1, "b": {"c": null}}, {"a": 2, "b": {"c": "x"}}]'
+        for args, expected in ((['(x.b for x in _)'], '{"c":null}\n{"c":"x"}\n'),
+                               (['-l', '(x.b.c for x in _)'], '\n"x"\n'),
+                               (['-ln', '(x.b.c for x in _)'], 'null\n"x"\n'),
+                               (['(x for x in [])'], '\n')):
+            f = io.StringIO()
+            with contextlib.redirect_stdout(f):
+                testargs = ['jello', *args]
+                with patch.object(sys, 'argv', testargs):
+                    _ = jello.cli.main(data=sample)
+
+            self.assertEqual(f.getvalue(), expected)
+
+    @unittest.skipIf(not hasattr(select, 'poll'), 'select.poll() is not available')
+    def test_stdout_closed(self):
+        """
+        Test a closed pipe on STDOUT is noticed without writing to it
+        """
+        read_fd, write_fd = os.pipe()
+        with os.fdopen(write_fd, 'w') as stdout, patch.object(sys, 'stdout', stdout):
+            self.assertFalse(jello.cli.stdout_closed())
+            os.close(read_fd)
+            self.assertTrue(jello.cli.stdout_closed())
+
+            with patch.object(jello.cli, 'STDOUT_CHECK_INTERVAL', 0):
+                watcher = jello.cli.StdoutWatcher()
+                self.assertRaises(BrokenPipeError, watcher.check)
+
+    def test_output_buffer(self):
+        """
+        Test large output is written in chunks to the binary buffer of STDOUT
+        """
+        sample = [{'a': i, 'b': 'é'} for i in range(2500)]
+        expected = json.dumps(sample, indent=2, ensure_ascii=False) + '\n'
+
+        raw = io.BytesIO()
+        stdout = io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+        with patch.object(sys, 'stdout', stdout):
+            testargs = ['jello', '-m']
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data=json.dumps(sample))
+
+        self.assertEqual(raw.getvalue().decode('utf-8'), expected)
+
+    def test_profile(self):
+        """
+        Test --profile prints the phases to STDERR without changing the output
+        """
+        sample = '{"a": 1}\n{"a": 2}\n'
+
+        query_phases = ['wrap', 'compile', 'exec', 'eval', 'unwrap']
+        runs = ((['-c'], '[{"a":1},{"a":2}]\n', ['read', 'load', 'query', *query_phases, 'write', 'serialize']),
+                (['--stream'], '1\n2\n', ['query', 'load', 'read', *query_phases, 'serialize', 'write']))
+
+        for args, expected, phases in runs:
+            stdout = io.StringIO()
+            stderr = io.StringIO()
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                testargs = ['jello', '--profile', *args, '_.a' if '--stream' in args else '_']
+                with patch.object(sys, 'argv', testargs), patch.object(jello.cli, 'get_stdin', return_value=sample):
+                    _ = jello.cli.main(data=None if '--stream' not in args else sample)
+
+            self.assertEqual(stdout.getvalue(), expected)
+
+            lines = stderr.getvalue().splitlines()
+            self.assertEqual(lines[0], 'jello:  Profile:')
+            self.assertEqual([line.split()[0] for line in lines[2:]], phases + ['other', 'total'])
+
+            opts.profile = opts.stream = opts.compact = None
+
+    def test_profile_lines(self):
+        """
+        Test --profile=lines prints the hits of each line of the query
+        """
+        query = 'total = 0\nfor i in _:\n    total += i\n\ntotal'
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            testargs = ['jello', '--profile=lines', query]
+            with patch.object(sys, 'argv', testargs):
+                _ = jello.cli.main(data='[1, 2, 3]')
+
+        self.assertEqual(stdout.getvalue(), '6\n')
+
+        lines = stderr.getvalue().splitlines()
+        self.assertEqual(lines[0], 'jello:  Query Profile:')
+        self.assertEqual([line.split()[:2] for line in lines[2:6]], [['1', '1'], ['2', '4'], ['3', '3'], ['5', '1']])
+        self.assertTrue(lines[4].endswith('total += i'))
+        self.assertEqual(lines[6], 'jello:  Profile:')
+
+    def test_profile_stats(self):
+        """
+        Test --profile-stats writes the cProfile stats of the functions of the query
+        """
+        import pstats
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stats_file = os.path.join(tmp_dir, 'query.pstats')
+            f = io.StringIO()
+            with contextlib.redirect_stdout(f):
+                testargs = ['jello', f'--profile-stats={stats_file}', 'sorted(_, key=lambda i: -i)']
+                with patch.object(sys, 'argv', testargs):
+                    _ = jello.cli.main(data='[1, 2, 3]')
+
+            stats = pstats.Stats(stats_file).stats
+
+        self.assertEqual(f.getvalue(), '[\n  3,\n  2,\n  1\n]\n')
+        self.assertEqual({func[0] for func in stats}, {'<string>'})
+        self.assertEqual(stats[('<string>', 1, '<lambda>')][1], 3)
+
+    def test_metrics_file(self):
+        """
+        Test --metrics-file appends a JSON line with the metrics of each run
+        """
+        sample = '{"a": 1}\n{"a": "é"}\n'
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_file = os.path.join(tmp_dir, 'metrics.jsonl')
+            for args in (['[r.a for r in _]'], ['--stream', '_.a'], ['--profile', '_'], ['_.b.c']):
+                f = io.StringIO()
+                with contextlib.redirect_stdout(f), contextlib.redirect_stderr(io.StringIO()):
+                    testargs = ['jello', f'--metrics-file={metrics_file}', *args]
+                    with patch.object(sys, 'argv', testargs):
+                        try:
+                            _ = jello.cli.main(data=sample)
+                        except SystemExit:
+                            pass
+
+                opts.stream = opts.compact = opts.profile = None
+
+            with open(metrics_file, encoding='utf-8') as metrics_in:
+                records = [json.loads(line) for line in metrics_in]
+
+        self.assertEqual(f.getvalue(), '')
+        self.assertEqual([(r['mode'], r['input_format'], r['bytes_read'], r['records'], r['exit_code']) for r in records],
+                         [('document', 'jsonl', 21, 2, 0), ('stream', 'jsonl', 21, 2, 0), ('document', 'jsonl', 21, 2, 0),
+                          ('document', 'jsonl', 21, 2, 1)])
+        self.assertEqual([r['output_bytes'] for r in records[:2]], [len('[\n  1,\n  "é"\n]\n'.encode('utf-8')),
+                                                                  len('1\n"é"\n'.encode('utf-8'))])
+        self.assertIn('wall_time', records[0])
+        self.assertIn('peak_rss', records[0])
+
+        # the phases are only timed with --profile
+        self.assertNotIn('phases', records[0])
+        self.assertEqual(list(records[2]['phases']), ['load', 'query', 'wrap', 'compile', 'exec', 'eval', 'unwrap', 'write', 'serialize'])
+
+    def test_profiler_nested_phases(self):
+        """
+        Test time spent in a nested phase is not counted in the outer phase
+        """
+        profiler = jello.cli.Profiler(enabled=True)
+        with profiler.phase('outer'):
+            for _ in profiler.iter('inner', range(3)):
+                with profiler.phase('inner'):
+                    time.sleep(0.01)
+
+        self.assertEqual(list(profiler.phases), ['outer', 'inner'])
+        self.assertIsNone(profiler.current)
+        self.assertEqual(profiler.stack, [])
+        self.assertGreaterEqual(profiler.phases['inner'][0], 0.03)
+        self.assertLess(profiler.phases['outer'][0], profiler.phases['inner'][0])
+
+    def test_bounded_text(self):
+        """
+        Test error details are the same as truncating the whole str() of the value
+        """
+        def truncated(value, length):
+            text = str(value).replace('\n', '\\n')
+            if len(text) > length * 2 + 10:
+                text = f'{text[:length]} ... {text[-length:]}'
+            return text
+
+        samples = ['', 'a\nb' * 20, {'a': "it's", 'b': 'say "hi"'}, ["'\"\\\n" * 10], (1,), (),
+                   b"'" * 40, bytearray(b'\'"' * 20), {'a': [None, True, 1.5, {}]}, [[[]]] * 10, 42]
+
+        for value in samples:
+            for length in (1, 5, 10, 30):
+                self.assertEqual(jello.cli.bounded_text(value, length), truncated(value, length))
+
+    def test_query_error_large_data(self):
+        """
+        Test the data in a query error message is truncated
+        """
+        data = [{'a': 'x' * 100, 'n': n} for n in range(100000)]
+        stderr = io.StringIO()
+        with patch.object(jello.cli, 'load_json', return_value=data), \
+             patch.object(jello.cli.shutil, 'get_terminal_size', return_value=os.terminal_size((80, 24))), \
+             contextlib.redirect_stderr(stderr):
+            testargs = ['jello', '_.nope']
+            with patch.object(sys, 'argv', testargs):
+                with self.assertRaises(SystemExit):
+                    jello.cli.main(data='[]')
+
+        message = stderr.getvalue()
+        self.assertIn("data:  [{'a': 'xxx", message)
+        self.assertIn("'n': 99999}]", message)
+        self.assertLess(len(message), 1000)
+
 
 if __name__ == '__main__':
     unittest.main()
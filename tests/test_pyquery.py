@@ -2,6 +2,7 @@
 
 import unittest
 import jello.cli
+import jello.lib
 from jello.cli import opts
 
 
@@ -162,6 +163,86 @@ class MyTests(unittest.TestCase):
         query = '_.get'
         self.assertRaises(ValueError, jello.cli.pyquery, data_in, query)
 
+    def test_nested_dotmap_output(self):
+        """
+        Test DotMaps inside containers built by the query are converted to dicts
+        """
+        data_in = {"foo": {"bar": 1}, "baz": [{"qux": 2}]}
+        query = '{"a": _.foo, "b": [_.baz[0]], "c": (_.foo,)}'
+        result = jello.cli.pyquery(data_in, query)
+        self.assertIs(type(result['a']), dict)
+        self.assertIs(type(result['b'][0]), dict)
+        self.assertIs(type(result['c'][0]), dict)
+        self.assertEqual(result, {"a": {"bar": 1}, "b": [{"qux": 2}], "c": ({"bar": 1},)})
+
+    def test_unmodified_output_not_copied(self):
+        """
+        Test read-only parts of the input are returned without a copy
+        """
+        data_in = {"foo": {"bar": [{"baz": 1}]}}
+        self.assertIs(jello.cli.pyquery(data_in, '_'), data_in)
+        self.assertIs(jello.cli.pyquery(data_in, '_.foo'), data_in['foo'])
+
+    def test_generator_result(self):
+        """
+        Test a generator result is returned as an iterator of normal dicts
+        """
+        data_in = [{"foo": {"bar": 1}}, {"foo": {"bar": 2}}]
+        result = jello.cli.pyquery(data_in, '(x.foo for x in _)')
+        self.assertFalse(isinstance(result, list))
+        items = list(result)
+        self.assertEqual(items, [{"bar": 1}, {"bar": 2}])
+        self.assertIs(type(items[0]), dict)
+
+    def test_pyquery_stream(self):
+        """
+        Test the query is run against each record
+        """
+        data_in = [{"foo": 1}, {"foo": 2}, [1, 2]]
+        query = 'len(_) if isinstance(_, list) else _.foo'
+        self.assertEqual(list(jello.lib.pyquery_stream(data_in, query)), [1, 2, 2])
+
+    def test_hooks(self):
+        """
+        Test the hooks are called when each phase starts and stops, with its size
+        """
+        events = []
+        hook = jello.lib.add_hook(lambda phase: events.append(('start', phase)),
+                                  lambda phase, seconds, size: events.append(('stop', phase, size)))
+        try:
+            data = jello.lib.load_json('[{"foo": 1}, {"foo": 2}]')
+            result = jello.lib.pyquery(data, 'x = 1\n[i.foo + x for i in _]')
+            output = jello.lib.Json().create_json(result)
+        finally:
+            jello.lib.remove_hook(hook)
+
+        self.assertEqual(events, [('start', 'load'), ('stop', 'load', 24),
+                                  ('start', 'wrap'), ('stop', 'wrap', 2),
+                                  ('start', 'compile'), ('stop', 'compile', 28),
+                                  ('start', 'exec'), ('stop', 'exec', None),
+                                  ('start', 'eval'), ('stop', 'eval', None),
+                                  ('start', 'unwrap'), ('stop', 'unwrap', None),
+                                  ('start', 'serialize'), ('stop', 'serialize', len(output))])
+
+        # nothing is called once the hook is removed
+        events.clear()
+        jello.lib.pyquery(data, '_')
+        self.assertEqual(events, [])
+
+    def test_hooks_stop_on_error(self):
+        """
+        Test the stop callback is called when a phase raises an exception
+        """
+        stopped = []
+        hook = jello.lib.add_hook(stop=lambda phase, seconds, size: stopped.append(phase))
+        try:
+            with self.assertRaises(ZeroDivisionError):
+                jello.lib.pyquery({}, '1 / 0')
+        finally:
+            jello.lib.remove_hook(hook)
+
+        self.assertEqual(stopped, ['wrap', 'compile', 'exec', 'eval'])
+
 
 if __name__ == '__main__':
     unittest.main()